@@ -1,7 +1,9 @@
-from fastapi import APIRouter, HTTPException
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Response
 from bson.errors import InvalidId
 from app.services.appointement import appointemntService
 from app.deps.auth import role_required
+from app.pagination import page_limit, set_next_cursor
 from app.models.appointemnt import Appointment, AppointmentCreate
 from app.models.user import Role, User
 from app.services.user import UserService
@@ -11,8 +13,10 @@ from app.services.Order import orderService
 router = APIRouter(prefix="/appointements")
 
 @router.get("/")
-async def get_appointements(user: User = role_required(Role.ADMIN, Role.Super_Admin), skip: int = 0, limit: int = 10)-> list[Appointment]:
-    appo =  await appointemntService.get_all_appointement( skip, limit)
+async def get_appointements(response: Response, user: User = role_required(Role.ADMIN, Role.Super_Admin), skip: int = 0, limit: int = 10, cursor: Optional[str] = None)-> list[Appointment]:
+    limit = page_limit(limit)
+    appo =  await appointemntService.get_all_appointement( skip, limit, cursor)
+    set_next_cursor(response, appo, limit)
     return appo
 
 @router.get("/my")
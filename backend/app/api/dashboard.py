@@ -1,24 +1,24 @@
-from fastapi import APIRouter, HTTPException
-from datetime import datetime, date
-from collections import defaultdict
-from app.models.analytics import DashboardAnalytics, MaterialTypePercentage, MonthlyOrder, MonthlyRevenue, OrderStatusPercentage
-from beanie import Document
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Query
+from app.models.analytics import DashboardAnalytics, TimeSeries, TimeSeriesGranularity
+from app.models.order import DeliveryType
 from app.deps.auth import role_required
 from app.models.user import Role, User
-from app.models.order import Order, OrderStatus
-from app.models.material import Material
-from app.services.user import UserService
-from app.services.Order import orderService
-from app.services.material import materialService
-from app.services.appointement import appointemntService
-from app.models.appointemnt import Appointment
+from app.services.analytics import analyticsService, rollupService
+from app.models.delivery_job import DeliveryJob, DeliveryOutboxStats
+from app.services.delivery_outbox import deliveryOutboxService
+from app.pagination import page_limit
 
 
 router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
 
-async def count_documents(model: Document) -> int:
-    """Helper function to count all documents in a collection."""
-    return await model.find_all().count()
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Orders store naive UTC datetimes; aware query values are converted to match."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
 
 
 @router.get("/analytics", response_model=DashboardAnalytics)
@@ -26,84 +26,7 @@ async def get_dashboard_analytics(
     user: User = role_required(Role.ADMIN, Role.Super_Admin)
 ) -> DashboardAnalytics:
     try:
-        total_users = await count_documents(User)
-        all_materials = await materialService.get_all_materials()
-        all_orders = await orderService.get_all_orders()
-        all_appointments = await appointemntService.get_all_appointement(skip=0, limit=1000)
-
-        total_available_materials = len(all_materials)
-        pending_orders = await orderService.get_all_orders(status=OrderStatus.PENDING)
-        total_pending_orders = len(pending_orders)
-
-        today = date.today()
-        today_appointments = [
-            a for a in all_appointments
-            if a.scheduled_at and a.scheduled_at.date() == today
-        ]
-        total_today_appointments = len(today_appointments)
-
-        order_status_counts = defaultdict(int)
-        for order in all_orders:
-            order_status_counts[order.status.value] += 1
-
-        total_orders = len(all_orders)
-        order_status_percentages = [
-            OrderStatusPercentage(
-                status=status,
-                percentage=round((count / total_orders) * 100) if total_orders > 0 else 0
-            )
-            for status, count in order_status_counts.items()
-        ]
-
-        material_type_counts = defaultdict(int)
-        for material in all_materials:
-            if material.material_type in ["polycopie", "book"]:
-                material_type_counts[material.material_type] += 1
-
-        total_materials_for_chart = sum(material_type_counts.values())
-        material_type_percentages = [
-            MaterialTypePercentage(
-                material_type=mat_type,
-                percentage=round((count / total_materials_for_chart) * 100)
-                if total_materials_for_chart > 0 else 0
-            )
-            for mat_type, count in material_type_counts.items()
-        ]
-
-        monthly_orders_map = defaultdict(int)
-        monthly_revenue_map = defaultdict(float)
-
-        current_year = datetime.now().year
-        for order in all_orders:
-            if order.created_at and order.created_at.year == current_year:
-                month_name = order.created_at.strftime("%b")
-                monthly_orders_map[month_name] += 1
-
-                order_revenue = 0
-                for material_link, quantity in order.item:
-                    if material_link:
-                        order_revenue += material_link.price_dzd * quantity
-                monthly_revenue_map[month_name] += order_revenue
-
-        monthly_orders = [
-            MonthlyOrder(month=month, count=count)
-            for month, count in monthly_orders_map.items()
-        ]
-        monthly_revenue = [
-            MonthlyRevenue(month=month, revenue=revenue)
-            for month, revenue in monthly_revenue_map.items()
-        ]
-
-        return DashboardAnalytics(
-            total_users=total_users,
-            total_available_materials=total_available_materials,
-            total_pending_orders=total_pending_orders,
-            total_today_appointments=total_today_appointments,
-            order_status_percentages=order_status_percentages,
-            material_type_percentages=material_type_percentages,
-            monthly_orders=monthly_orders,
-            monthly_revenue=monthly_revenue,
-        )
+        return await analyticsService.get_dashboard_analytics()
 
     except Exception as e:
         print(f"An error occurred while generating dashboard analytics: {e}")
@@ -111,3 +34,63 @@ async def get_dashboard_analytics(
             status_code=500,
             detail="An error occurred while fetching dashboard analytics."
         )
+
+
+@router.get("/timeseries", response_model=TimeSeries)
+async def get_timeseries(
+    start: Optional[datetime] = Query(None, description="Inclusive, defaults to one year before end"),
+    end: Optional[datetime] = Query(None, description="Exclusive, defaults to now"),
+    granularity: TimeSeriesGranularity = TimeSeriesGranularity.MONTH,
+    era: Optional[str] = Query(None),
+    material_type: Optional[str] = Query(None),
+    delivery_type: Optional[DeliveryType] = Query(None),
+    user: User = role_required(Role.ADMIN, Role.Super_Admin),
+):
+    """
+    Order count and revenue per day, week or month over any date range
+    """
+    end = _as_utc(end) or datetime.utcnow()
+    start = _as_utc(start) or end - timedelta(days=365)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    return await analyticsService.order_timeseries(
+        start=start,
+        end=end,
+        granularity=granularity,
+        era=era,
+        material_type=material_type,
+        delivery_type=delivery_type,
+    )
+
+
+@router.post("/rollups/rebuild")
+async def rebuild_rollups(user: User = role_required(Role.Super_Admin)):
+    """
+    Recompute the analytics rollups from scratch to repair any drift
+    """
+    count = await rollupService.rebuild()
+    return {"message": f"Rebuilt {count} analytics rollups"}
+
+
+@router.get("/delivery-outbox", response_model=DeliveryOutboxStats)
+async def get_delivery_outbox_stats(user: User = role_required(Role.ADMIN, Role.Super_Admin)):
+    """
+    Queue depth and latency of the ZR Express delivery outbox
+    """
+    return await deliveryOutboxService.stats()
+
+
+@router.get("/delivery-outbox/dead", response_model=List[DeliveryJob])
+async def get_dead_delivery_jobs(
+    skip: int = 0,
+    limit: int = 50,
+    user: User = role_required(Role.ADMIN, Role.Super_Admin),
+):
+    return await deliveryOutboxService.get_dead_jobs(skip, page_limit(limit))
+
+
+@router.post("/delivery-outbox/{job_id}/retry")
+async def retry_delivery_job(job_id: str, user: User = role_required(Role.Super_Admin)):
+    if not await deliveryOutboxService.requeue(job_id):
+        raise HTTPException(status_code=404, detail="Dead delivery job not found")
+    return {"message": "Delivery job queued again"}
@@ -1,12 +1,15 @@
 from datetime import datetime
 import os
-from fastapi import APIRouter, Query, UploadFile, File, Form,  HTTPException
+from fastapi import APIRouter, Query, Response, UploadFile, File, Form,  HTTPException
 from typing import List, Optional
 from fastapi.responses import StreamingResponse
 from app.services.material import materialService
-from app.models.material import Material, materialUser
+from app.models.material import Material, MaterialFacets, materialUser
 from app.models.user import Role, User
 from app.deps.auth import role_required
+from app.pagination import page_limit, set_next_cursor, set_total_count
+from app.responses import FastJSONResponse, fast_json_response
+from app.config import settings
 import uuid
 from app.minio import DocumentBucket, ImageBucket
 
@@ -18,6 +21,7 @@ document_bucket = DocumentBucket(file_prefix="materials/documents")
 
 @router.get("/filter/user", response_model=List[materialUser])
 async def get_materials_user(
+    response: Response,
     title: Optional[str] = Query(None),
     material_type: Optional[str] = Query(None),
     min_price: Optional[float] = Query(None),
@@ -28,8 +32,10 @@ async def get_materials_user(
     specialite: Optional[str] = Query(None),
     skip: int = 0,
     limit: int = 10,
+    cursor: Optional[str] = Query(None),
 ):
-    return await materialService.filter_materials_user(
+    limit = page_limit(limit)
+    materials = await materialService.filter_materials_user(
         title=title,
         material_type=material_type,
         min_price=min_price,
@@ -40,7 +46,14 @@ async def get_materials_user(
         specialite=specialite,
         skip=skip,
         limit=limit,
+        cursor=cursor,
     )
+    if not title:
+        # Title searches are ranked by relevance and paged with skip.
+        set_next_cursor(response, materials, limit)
+    if settings.FAST_JSON_RESPONSES:
+        return fast_json_response(materials, response)
+    return materials
     
 @router.post("/", response_model=Material)
 async def create_material(
@@ -111,23 +124,40 @@ async def get_image(file_url: str):
     )
 
 @router.get("/get-all/user", response_model=List[materialUser])
-async def get_all_materials_user(user: User = role_required(Role.ADMIN, Role.Super_Admin, Role.USER)):
-    materials = await materialService.get_all_materials()
-    if not materials:
-        raise HTTPException(status_code=404, detail="Materials not found")
-    return [materialUser.model_validate(m, from_attributes=True) for m in materials]
+async def get_all_materials_user(
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = settings.MAX_PAGE_SIZE,
+    include_total: bool = False,
+    user: User = role_required(Role.ADMIN, Role.Super_Admin, Role.USER),
+):
+    materials, total = await materialService.get_all_material_user(skip, limit)
+    if include_total:
+        set_total_count(response, total)
+    return materials
 
 @router.get("/", response_model=List[Material])
-async def get_all_materials_admin_paginated( user: User = role_required(Role.ADMIN, Role.Super_Admin), skip: int = 0, limit: int = 10):
-    return await materialService.get_all_materials(skip, limit)
+async def get_all_materials_admin_paginated(
+    response: Response,
+    user: User = role_required(Role.ADMIN, Role.Super_Admin),
+    skip: int = Query(0, ge=0),
+    limit: int = 10,
+    include_total: bool = False,
+):
+    materials = await materialService.get_all_materials(skip, limit)
+    if include_total:
+        set_total_count(response, await materialService.count_materials())
+    if settings.FAST_JSON_RESPONSES:
+        return fast_json_response(materials, response)
+    return materials
 
 @router.get("/search/admin", response_model=List[Material])
-async def search_by_title(q: str, user: User = role_required(Role.ADMIN, Role.Super_Admin, Role.USER)):
-    return await materialService.search_materials_by_title(q)
+async def search_by_title(q: str, limit: int = Query(50, ge=1, le=settings.MAX_PAGE_SIZE), user: User = role_required(Role.ADMIN, Role.Super_Admin, Role.USER)):
+    return await materialService.search_materials_by_title(q, limit)
 
 @router.get("/filter/type/admin", response_model=List[Material])
-async def get_by_type(type: str, user: User = role_required(Role.ADMIN, Role.Super_Admin, Role.USER)):
-    return await materialService.get_materials_by_type(type)
+async def get_by_type(type: str, skip: int = Query(0, ge=0), limit: int = 10, user: User = role_required(Role.ADMIN, Role.Super_Admin, Role.USER)):
+    return await materialService.get_materials_by_type_admin(type, skip, limit)
 
 @router.get("/filter/admin", response_model=List[Material])
 async def get_materials_admin(
@@ -140,23 +170,55 @@ async def get_materials_admin(
     limit: int = 10,
     user: User = role_required(Role.ADMIN, Role.Super_Admin),
 ):
-    return await materialService.filter_materials_admin(
+    materials = await materialService.filter_materials_admin(
         title=title,
         material_type=material_type,
         min_price=min_price,
         max_price=max_price,
         date=date,
         skip=skip,
-        limit=limit,
+        limit=page_limit(limit),
+    )
+    if settings.FAST_JSON_RESPONSES:
+        return FastJSONResponse(materials)
+    return materials
+
+@router.get("/facets", response_model=MaterialFacets)
+async def get_material_facets(
+    title: Optional[str] = Query(None),
+    material_type: Optional[str] = Query(None),
+    min_price: Optional[float] = Query(None),
+    max_price: Optional[float] = Query(None),
+    date: Optional[datetime] = Query(None),
+    subject: Optional[str] = Query(None),
+    annee: Optional[str] = Query(None),
+    specialite: Optional[str] = Query(None),
+    skip: int = 0,
+    limit: int = 10,
+    cursor: Optional[str] = Query(None),
+    user: User = role_required(Role.ADMIN, Role.Super_Admin, Role.USER),
+):
+    return await materialService.facet_materials(
+        title=title,
+        material_type=material_type,
+        min_price=min_price,
+        max_price=max_price,
+        date=date,
+        subject=subject,
+        annee=annee,
+        specialite=specialite,
+        skip=skip,
+        limit=page_limit(limit),
+        cursor=cursor,
     )
 
 @router.get("/filter/date/admin", response_model=List[Material], description="ISO format: yyyy-mm-dd")
-async def get_by_date(date: str, user: User = role_required(Role.ADMIN, Role.Super_Admin, Role.USER)):
+async def get_by_date(date: str, skip: int = Query(0, ge=0), limit: int = 10, user: User = role_required(Role.ADMIN, Role.Super_Admin, Role.USER)):
     try:
         parsed = datetime.fromisoformat(date)
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid date format")
-    return await materialService.get_materials_by_date(parsed)
+    return await materialService.get_materials_by_date(parsed, skip, limit)
 
 @router.delete("/{material_id}")
 async def delete_material(
@@ -1,13 +1,56 @@
-from fastapi import APIRouter, HTTPException, Body
-from typing import List, Optional
+import csv
+import io
+import json
+from fastapi import APIRouter, HTTPException, Body, Header, Query, Response
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, List, Optional, Set
 from datetime import datetime
-from app.services.Order import orderService
-from app.models.order import Order, OrderCreate, OrderStatus, orderResponse, serialize_order, serialize_order_F, DeliveryType
+from app.services.Order import orderService, order_events, ORDER_EXPORT_FIELDS
+from app.models.order import BulkTransitionRequest, BulkTransitionResult, ExportFormat, Order, OrderCreate, OrderStatus, orderResponse, serialize_order, serialize_order_F, serialize_order_response, DeliveryType
 from app.models.user import User, Role
 from app.deps.auth import role_required
+from app.pagination import page_limit, set_next_cursor
+from app.events import Event
+from app.responses import fast_json_response
+from app.config import settings
 
 router = APIRouter(prefix="/orders", tags=["Orders"])
 
+EXPORT_CHUNK_SIZE = 64 * 1024
+BULK_TRANSITION_MAX_ORDERS = 500
+
+
+def _export_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+async def _csv_chunks(rows: AsyncIterator[dict]) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=list(ORDER_EXPORT_FIELDS), extrasaction="ignore")
+    writer.writeheader()
+    async for row in rows:
+        writer.writerow({key: _export_value(value) for key, value in row.items()})
+        if buffer.tell() >= EXPORT_CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+async def _ndjson_chunks(rows: AsyncIterator[dict]) -> AsyncIterator[str]:
+    lines = []
+    size = 0
+    async for row in rows:
+        line = json.dumps({key: _export_value(value) for key, value in row.items()}, ensure_ascii=False)
+        lines.append(line)
+        size += len(line) + 1
+        if size >= EXPORT_CHUNK_SIZE:
+            yield "\n".join(lines) + "\n"
+            lines = []
+            size = 0
+    if lines:
+        yield "\n".join(lines) + "\n"
+
 
 @router.post("/", response_model=orderResponse)
 async def create_order(
@@ -22,32 +65,141 @@ async def create_order(
 
 
 @router.get("/my", response_model=List[orderResponse])
-async def get_my_orders(user: User = role_required(Role.USER, Role.ADMIN, Role.Super_Admin)):
-    orders = await orderService.get_orders_by_student(str(user.id))
+async def get_my_orders(
+    response: Response,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    user: User = role_required(Role.USER, Role.ADMIN, Role.Super_Admin)
+):
+    limit = page_limit(limit)
+    orders = await orderService.get_orders_by_student(str(user.id), limit, cursor)
+    set_next_cursor(response, orders, limit)
+    if settings.FAST_JSON_RESPONSES:
+        return fast_json_response([serialize_order_response(order) for order in orders], response)
     return [serialize_order(order) for order in orders]
 
 
 @router.get("/get_admin_orders")
-async def get_admin_orders(user: User = role_required(Role.ADMIN, Role.Super_Admin)):
-    area: str = user.era
-    ReturnOrders = []
-    orders = await orderService.get_all_orders()
-    for order in orders:
-        student = await order.student.fetch()
-        if student.era == area:
-            ReturnOrders.append(serialize_order_F(order, student))
-        else:
-            continue
-    print(ReturnOrders)
-    return ReturnOrders
+async def get_admin_orders(
+    response: Response,
+    status: Optional[OrderStatus] = None,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    user: User = role_required(Role.ADMIN, Role.Super_Admin)
+):
+    if not user.era:
+        raise HTTPException(status_code=403, detail="No era is assigned to this admin account")
+    limit = page_limit(limit)
+    orders = await orderService.get_orders_by_era(user.era, status, limit, cursor)
+    set_next_cursor(response, orders, limit)
+    students = await orderService.get_students(orders)
+    serialized = [
+        serialize_order_F(order, students.get(order.student.to_ref().id))
+        for order in orders
+    ]
+    if settings.FAST_JSON_RESPONSES:
+        return fast_json_response(serialized, response)
+    return serialized
 
 
 @router.get("/admin", response_model=List[Order])
 async def get_all_orders(
+    response: Response,
+    status: Optional[OrderStatus] = None,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    admin: User = role_required(Role.ADMIN, Role.Super_Admin)
+):
+    limit = page_limit(limit)
+    orders = await orderService.get_all_orders(status, limit, cursor)
+    set_next_cursor(response, orders, limit)
+    if settings.FAST_JSON_RESPONSES:
+        return fast_json_response(orders, response)
+    return orders
+
+
+@router.get("/export")
+async def export_orders(
+    format: ExportFormat = ExportFormat.CSV,
+    start: Optional[datetime] = Query(None, description="Inclusive lower bound on created_at"),
+    end: Optional[datetime] = Query(None, description="Exclusive upper bound on created_at"),
     status: Optional[OrderStatus] = None,
     admin: User = role_required(Role.ADMIN, Role.Super_Admin)
 ):
-    return await orderService.get_all_orders(status)
+    """
+    Stream one row per order line as CSV or NDJSON, straight from a database cursor
+    """
+    rows = orderService.export_order_lines(start, end, status)
+    filename = f"orders-{datetime.utcnow():%Y%m%d%H%M}.{format.value}"
+    if format == ExportFormat.NDJSON:
+        content, media_type = _ndjson_chunks(rows), "application/x-ndjson"
+    else:
+        content, media_type = _csv_chunks(rows), "text/csv"
+    return StreamingResponse(
+        content=content,
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+
+async def _sse_chunks(events: AsyncIterator[Optional[Event]], era: Optional[str], statuses: Set[str]) -> AsyncIterator[str]:
+    async for event in events:
+        if event is None:
+            yield ": keepalive\n\n"
+            continue
+        if event.type != "reset":
+            if era and event.data["student_era"] != era:
+                continue
+            if statuses and not statuses & {event.data["status"], event.data["previous_status"]}:
+                continue
+        yield f"id: {event.id}\nevent: {event.type}\ndata: {json.dumps(event.data)}\n\n"
+
+
+@router.get("/events")
+async def order_events_stream(
+    era: Optional[str] = Query(None),
+    status: Optional[List[OrderStatus]] = Query(None, description="Orders entering or leaving these statuses"),
+    last_event_id: Optional[str] = Query(None, description="Resume token, for clients that cannot send the Last-Event-ID header"),
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID"),
+    admin: User = role_required(Role.ADMIN, Role.Super_Admin)
+):
+    """
+    Server-sent events for created, transitioned and deleted orders.
+    Reconnecting with the last received event id replays only the missed events;
+    a "reset" event means they are no longer available and the client should refetch.
+    Only a Super_Admin may pick the era, or omit it for every era; admins get their own.
+    """
+    if admin.role != Role.Super_Admin:
+        if not admin.era:
+            raise HTTPException(status_code=403, detail="No era is assigned to this admin account")
+        era = admin.era
+    events = order_events.subscribe(
+        last_event_id_header or last_event_id,
+        keepalive=settings.ORDER_EVENTS_KEEPALIVE_SECONDS,
+    )
+    return StreamingResponse(
+        content=_sse_chunks(events, era, {s.value for s in status or []}),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/admin/bulk-transition", response_model=List[BulkTransitionResult])
+async def bulk_transition(
+    request: BulkTransitionRequest,
+    admin: User = role_required(Role.ADMIN, Role.Super_Admin)
+):
+    """
+    Move many orders to `status` at once. Each order reports its own success or failure;
+    delivery orders made ready are sent to ZR Express in one batch.
+    """
+    if len(request.order_ids) > BULK_TRANSITION_MAX_ORDERS:
+        raise HTTPException(status_code=400, detail=f"At most {BULK_TRANSITION_MAX_ORDERS} orders per request")
+    if request.status == OrderStatus.READY and request.appointment_date is None:
+        raise HTTPException(status_code=400, detail="appointment_date is required to mark orders as ready")
+    return await orderService.bulk_transition(
+        request.order_ids, request.status, admin, request.appointment_date
+    )
 
 
 @router.patch("/admin/{order_id}/accept", response_model=Order)
@@ -68,7 +220,7 @@ async def mark_order_ready(
     admin: User = role_required(Role.ADMIN, Role.Super_Admin)
 ):
     """
-    Mark order as ready. If delivery_type is DELIVERY, automatically sends to ZR Express
+    Mark order as ready. If delivery_type is DELIVERY, queues its ZR Express delivery creation
     """
     order = await orderService.mark_order_as_ready(order_id, appointment_date, admin)
     if not order:
@@ -77,10 +229,8 @@ async def mark_order_ready(
     response_data = serialize_order(order)
     
     
-    if order.delivery_type == DeliveryType.DELIVERY and order.zr_tracking_id:
-        response_data["message"] = f"Order sent to ZR Express for delivery. Tracking ID: {order.zr_tracking_id}"
-    elif order.delivery_type == DeliveryType.DELIVERY and not order.zr_tracking_id:
-        response_data["message"] = "Order ready but delivery creation failed. Please try again or contact support."
+    if order.delivery_type == DeliveryType.DELIVERY:
+        response_data["message"] = "Order ready. The ZR Express delivery is being created."
     else:
         response_data["message"] = "Order ready for pickup"
     
@@ -1,5 +1,5 @@
-from typing import List
-from fastapi import APIRouter, BackgroundTasks
+from typing import List, Optional
+from fastapi import APIRouter, BackgroundTasks, Response
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 from app.models.user import ResetPasswordRequest, Role, UserCreate, UserLogin, UserUpdate, VerifyCodeRequest
@@ -9,6 +9,9 @@ from app.deps.auth import get_current_user
 from fastapi.responses import JSONResponse
 from app.config import settings
 from app.deps.auth import role_required
+from app.services.user import UserService
+from app.services.Order import orderService
+from app.pagination import page_limit, set_next_cursor
 from app.utils import send_email
 from bson import ObjectId
 import random
@@ -27,7 +30,7 @@ async def add_user(user: UserCreate):
             phone_number=user.phone_number,
             era=user.era
         )
-        await userpay.insert()
+        await UserService.insert_user(userpay)
         return {"message": "User added successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -47,7 +50,7 @@ async def register_user(data: UserCreate):
         study_year=data.study_year,
         era=data.era
     )
-    await user.insert()
+    await UserService.insert_user(user)
     access_token = create_access_token(data={"sub": str(user.id)})
     if not access_token:
         raise HTTPException(status_code=500, detail="Could not create access token")
@@ -117,6 +120,7 @@ async def add_admin(
     user.roles.append(Role.ADMIN.value)
     user.era = placement.placement
     await user.save()
+    await orderService.set_student_era(user.id, user.era)
     return user
 
 
@@ -126,7 +130,7 @@ async def delete_user(user_id: str):
     user = await User.find_one({"_id": ObjectId(user_id)})
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    await user.delete()
+    await UserService.delete_user(user)
     return {"message": "User deleted successfully"}
 
 @router.delete("/remove-admin/{user_id}")
@@ -160,9 +164,12 @@ async def unblock_user(user: User = role_required(Role.Super_Admin), user_id: st
 
 
 @router.get("/all-users", response_model=List[User])
-async def get_all_users_paginated(user: User = role_required(Role.Super_Admin),
-                                  skip: int = 0, limit: int = 10):
-    return await User.find().skip(skip).limit(limit).to_list()
+async def get_all_users_paginated(response: Response, user: User = role_required(Role.Super_Admin),
+                                  skip: int = 0, limit: int = 10, cursor: Optional[str] = None):
+    limit = page_limit(limit)
+    users = await UserService.get_users(skip, limit, cursor)
+    set_next_cursor(response, users, limit)
+    return users
 
 
 @router.get("/all-admins", response_model=List[User])
@@ -259,6 +266,8 @@ async def update_user(user_id: str, data: UserUpdate, current_user: User = role_
     if data.era:
         user.era = data.era
     await user.save()
+    if data.era:
+        await orderService.set_student_era(user.id, user.era)
     return user
 
 
@@ -0,0 +1,36 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable
+
+
+class TTLCache:
+    """
+    Process-local cache for a single computed value.
+    Concurrent misses wait on one computation instead of each running their own,
+    and `invalidate` also discards the result of a computation already in flight.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._value: Any = None
+        self._expires_at = 0.0
+        self._generation = 0
+        self._lock = asyncio.Lock()
+
+    def invalidate(self) -> None:
+        self._generation += 1
+        self._value = None
+        self._expires_at = 0.0
+
+    async def get(self, compute: Callable[[], Awaitable[Any]]) -> Any:
+        if time.monotonic() < self._expires_at:
+            return self._value
+        async with self._lock:
+            if time.monotonic() < self._expires_at:
+                return self._value
+            generation = self._generation
+            value = await compute()
+            if generation == self._generation:
+                self._value = value
+                self._expires_at = time.monotonic() + self.ttl
+            return value
@@ -0,0 +1,119 @@
+import asyncio
+import bisect
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+from app.config import settings
+from app.models.material import Material, materialUser
+from app.pagination import KEYSET_SORT, decode_cursor
+
+
+class MaterialCatalog:
+    """
+    Process-local snapshot of the catalog as materialUser records in KEYSET_SORT order,
+    with a position index per exact-match filter field.
+
+    The snapshot carries the catalog version it was built from. materialService bumps the
+    version stored in Mongo on every write, and a read more than `check_interval` seconds
+    after the last check compares the two, so writes made by other workers are picked up too.
+    """
+
+    INDEXED_FIELDS = ("material_type", "study_year", "specialite", "module")
+
+    def __init__(self, check_interval: float):
+        self.check_interval = check_interval
+        self.version: Optional[int] = None
+        self.materials: List[materialUser] = []
+        self._keys: list = []  # (created_at, id) of each material, descending
+        self._index: Dict[str, Dict[Optional[str], List[int]]] = {}
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def _versions():
+        return Material.get_pymongo_collection().database["catalog_versions"]
+
+    async def _stored_version(self) -> int:
+        doc = await self._versions().find_one({"_id": Material.get_collection_name()})
+        return doc["version"] if doc else 0
+
+    async def bump(self) -> None:
+        """Records a catalog write; every worker's next read rebuilds its snapshot."""
+        await self._versions().update_one(
+            {"_id": Material.get_collection_name()}, {"$inc": {"version": 1}}, upsert=True
+        )
+        self._checked_at = 0.0
+
+    async def load(self) -> None:
+        version = await self._stored_version()
+        materials = await Material.find_all().sort(KEYSET_SORT).project(materialUser).to_list()
+        index: Dict[str, Dict[Optional[str], List[int]]] = {field: {} for field in self.INDEXED_FIELDS}
+        for position, material in enumerate(materials):
+            for field in self.INDEXED_FIELDS:
+                index[field].setdefault(getattr(material, field), []).append(position)
+        self.materials = materials
+        self._keys = [(material.created_at, material.id) for material in materials]
+        self._index = index
+        self.version = version
+        self._checked_at = time.monotonic()
+
+    async def snapshot(self) -> "MaterialCatalog":
+        if self.version is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return self
+        async with self._lock:
+            if self.version is not None and time.monotonic() - self._checked_at < self.check_interval:
+                return self
+            if self.version is None or await self._stored_version() != self.version:
+                await self.load()
+            else:
+                self._checked_at = time.monotonic()
+        return self
+
+    def positions(self, **filters: Optional[str]) -> List[int]:
+        """Positions of the materials equal to every non-None filter, in catalog order."""
+        lists = [self._index[field].get(value, []) for field, value in filters.items() if value is not None]
+        if not lists:
+            return list(range(len(self.materials)))
+        lists.sort(key=len)
+        matches = set(lists[0]).intersection(*lists[1:])
+        return sorted(matches)
+
+    def filter(
+        self,
+        material_type: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        subject: Optional[str] = None,
+        annee: Optional[str] = None,
+        specialite: Optional[str] = None,
+        date: Optional[datetime] = None,
+        skip: int = 0,
+        limit: int = 10,
+        cursor: Optional[str] = None,
+    ) -> List[materialUser]:
+        """Same filters and paging as materialService.filter_materials_admin, without the title search."""
+        positions = self.positions(material_type=material_type, module=subject, study_year=annee, specialite=specialite)
+        if cursor:
+            key = decode_cursor(cursor)
+            start = bisect.bisect_left(range(len(self._keys)), True, key=lambda i: self._keys[i] < key)
+            positions = positions[bisect.bisect_left(positions, start):]
+            skip = 0
+        page = []
+        for position in positions:
+            material = self.materials[position]
+            if min_price is not None and material.price_dzd < min_price:
+                continue
+            if max_price is not None and material.price_dzd > max_price:
+                continue
+            if date is not None and material.created_at != date:
+                continue
+            if skip:
+                skip -= 1
+                continue
+            page.append(material)
+            if len(page) >= limit:
+                break
+        return page
+
+
+material_catalog = MaterialCatalog(check_interval=settings.MATERIAL_CATALOG_CHECK_SECONDS)
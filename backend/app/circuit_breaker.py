@@ -0,0 +1,83 @@
+import time
+from collections import deque
+from enum import Enum
+from typing import Deque
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    HALF_OPEN = "half_open"
+    OPEN = "open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Fails fast once the share of failures among the last `window` calls reaches
+    `failure_rate` (after at least `minimum_calls`). After `open_seconds` it lets up to
+    `half_open_calls` probe calls through: all succeeding closes the circuit, any failing reopens it.
+    """
+
+    def __init__(self, name: str, failure_rate: float, minimum_calls: int, window: int,
+                 open_seconds: float, half_open_calls: int):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.minimum_calls = minimum_calls
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self.state = CircuitState.CLOSED
+        self._outcomes: Deque[bool] = deque(maxlen=window)  # True for a failure
+        self._opened_at = 0.0
+        self._probes = 0
+        self._probe_successes = 0
+
+    def allows_calls(self) -> bool:
+        """Whether a call would be let through now, without claiming a probe slot."""
+        if self.state == CircuitState.OPEN:
+            return time.monotonic() - self._opened_at >= self.open_seconds
+        if self.state == CircuitState.HALF_OPEN:
+            return self._probes < self.half_open_calls
+        return True
+
+    def before_call(self) -> None:
+        if self.state == CircuitState.OPEN:
+            if time.monotonic() - self._opened_at < self.open_seconds:
+                raise CircuitOpenError(f"{self.name} circuit is open")
+            self.state = CircuitState.HALF_OPEN
+            self._probes = 0
+            self._probe_successes = 0
+        if self.state == CircuitState.HALF_OPEN:
+            if self._probes >= self.half_open_calls:
+                raise CircuitOpenError(f"{self.name} circuit is half-open and probing")
+            self._probes += 1
+
+    def release(self) -> None:
+        """Gives back the probe slot of a call that ended with no outcome, e.g. cancelled."""
+        if self.state == CircuitState.HALF_OPEN and self._probes > 0:
+            self._probes -= 1
+
+    def record_success(self) -> None:
+        if self.state == CircuitState.HALF_OPEN:
+            self._probe_successes += 1
+            if self._probe_successes >= self.half_open_calls:
+                self.state = CircuitState.CLOSED
+                self._outcomes.clear()
+            return
+        self._outcomes.append(False)
+
+    def record_failure(self) -> None:
+        if self.state == CircuitState.HALF_OPEN:
+            self._open()
+            return
+        self._outcomes.append(True)
+        if len(self._outcomes) >= self.minimum_calls and sum(self._outcomes) / len(self._outcomes) >= self.failure_rate:
+            self._open()
+
+    def _open(self) -> None:
+        print(f"{self.name} circuit opened for {self.open_seconds}s")
+        self.state = CircuitState.OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
@@ -0,0 +1,50 @@
+"""
+Maintenance commands, run from the backend directory:
+
+    python -m app.commands rebuild-rollups
+    python -m app.commands backfill-student-era
+    python -m app.commands backfill-order-lines
+"""
+import argparse
+import asyncio
+from app.main import init_mongo
+from app.services.analytics import rollupService
+from app.services.Order import orderService
+
+
+async def rebuild_rollups() -> None:
+    count = await rollupService.rebuild()
+    print(f"Rebuilt {count} analytics rollups")
+
+
+async def backfill_student_era() -> None:
+    modified = await orderService.backfill_student_era()
+    print(f"Set student_era on {modified} orders")
+
+
+async def backfill_order_lines() -> None:
+    modified = await orderService.backfill_order_lines()
+    print(f"Snapshotted the lines of {modified} orders")
+
+
+COMMANDS = {
+    "rebuild-rollups": rebuild_rollups,
+    "backfill-student-era": backfill_student_era,
+    "backfill-order-lines": backfill_order_lines,
+}
+
+
+async def run(command: str) -> None:
+    await init_mongo()
+    await COMMANDS[command]()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Backend maintenance commands")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    args = parser.parse_args()
+    asyncio.run(run(args.command))
+
+
+if __name__ == "__main__":
+    main()
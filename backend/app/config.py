@@ -1,4 +1,5 @@
 import os
+from typing import Optional
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from fastapi_mail import ConnectionConfig
@@ -30,6 +31,48 @@ class Settings(BaseSettings):
     MAIL_FROM_ADDRESS: str
     ZR_EXPRESS_TOKEN: str
     ZR_EXPRESS_KEY: str
+    ZR_EXPRESS_BASE_URL: str = "https://procolis.com/api_v1"
+    # Comma-separated /lire "Situation" values, matched ignoring case and accents.
+    # Delivered ones move an order to DELIVERED; known ones are left as they are; anything else is logged.
+    ZR_EXPRESS_DELIVERED_SITUATIONS: str = "Livré,Livré et non encaissé,Encaissé non payé,Paiements prêts,Payé et archivé"
+    ZR_EXPRESS_KNOWN_SITUATIONS: str = (
+        "En préparation,Prêt à expédier,Confirmé au bureau,Dispatcher,Vers Wilaya,En livraison,"
+        "Suspendu,Annulé,Retour chez livreur,Retour transit,Retour reçu,Retourné au vendeur"
+    )
+    ZR_EXPRESS_MAX_CONNECTIONS: int = 20
+    ZR_EXPRESS_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    ZR_EXPRESS_KEEPALIVE_EXPIRY_SECONDS: float = 60
+    ZR_EXPRESS_CONNECT_TIMEOUT_SECONDS: float = 5
+    ZR_EXPRESS_CREATE_TIMEOUT_SECONDS: float = 30
+    ZR_EXPRESS_READ_TIMEOUT_SECONDS: float = 10
+    ZR_EXPRESS_UPDATE_TIMEOUT_SECONDS: float = 10
+    ZR_EXPRESS_BREAKER_FAILURE_RATE: float = 0.5
+    ZR_EXPRESS_BREAKER_MINIMUM_CALLS: int = 10
+    ZR_EXPRESS_BREAKER_WINDOW: int = 50
+    ZR_EXPRESS_BREAKER_OPEN_SECONDS: float = 30
+    ZR_EXPRESS_BREAKER_HALF_OPEN_CALLS: int = 3
+    ZR_EXPRESS_BATCH_WINDOW_SECONDS: float = 0.5
+    ZR_EXPRESS_BATCH_MAX_SIZE: int = 50
+    DELIVERY_POLL_INTERVAL_SECONDS: float = 300  # 0 disables the delivery status poller
+    DELIVERY_POLL_BATCH_SIZE: int = 100
+    DELIVERY_LOOKUP_RETRY_SECONDS: float = 300  # wait before looking up again a parcel ZR Express did not report
+    DELIVERY_OUTBOX_MAX_ATTEMPTS: int = 8
+    DELIVERY_OUTBOX_BACKOFF_BASE_SECONDS: float = 30
+    DELIVERY_OUTBOX_BACKOFF_MAX_SECONDS: float = 3600
+    DELIVERY_OUTBOX_LEASE_SECONDS: float = 120
+    DELIVERY_OUTBOX_POLL_SECONDS: float = 10
+    DELIVERY_OUTBOX_SWEEP_SECONDS: float = 300  # how often ready delivery orders missing a job are enqueued; 0 disables
+
+    DASHBOARD_CACHE_TTL_SECONDS: float = 60
+    ANALYTICS_REBUILD_TIMEOUT_SECONDS: float = 600  # a rollup rebuild running longer is taken for dead and no longer diverts increments
+    MONGO_BUILD_INDEXES_IN_BACKGROUND: bool = False  # build declared indexes after startup instead of before it
+    MONGO_INDEX_REPORT: bool = True  # explain the service queries once indexes exist and flag COLLSCAN plans
+    MAX_PAGE_SIZE: int = 100
+    MATERIAL_CATALOG_CHECK_SECONDS: float = 5  # how stale the in-memory catalog may be after another worker's write
+    METRICS_TOKEN: Optional[str] = None  # GET /metrics answers 404 until set, then requires "Authorization: Bearer <token>"
+    FAST_JSON_RESPONSES: bool = False  # list endpoints skip response_model validation and encode with orjson
+    ORDER_EVENTS_HISTORY: int = 1000
+    ORDER_EVENTS_KEEPALIVE_SECONDS: float = 15
 
     model_config = SettingsConfigDict(
         case_sensitive=True,
@@ -0,0 +1,86 @@
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Deque, Dict, Optional, Set
+
+
+@dataclass
+class Event:
+    id: str
+    type: str
+    data: Dict[str, Any]
+
+
+class EventBus:
+    """
+    Process-local pub/sub with a bounded replay history.
+    Event ids are "<epoch>-<sequence>", where the epoch changes on every restart, so a
+    subscriber resuming from an id replays exactly what it missed, or gets a "reset"
+    event when that history is gone (evicted or from a previous process) and must refetch.
+    A subscriber that falls more than `queue_size` events behind is disconnected and
+    resumes from its last id on reconnect, so a slow client never blocks publishers.
+    """
+
+    def __init__(self, history: int, queue_size: int = 256):
+        self.queue_size = queue_size
+        self._epoch = str(int(time.time() * 1000))
+        self._sequence = 0
+        self._history: Deque[Event] = deque(maxlen=history)
+        self._subscribers: Set[asyncio.Queue] = set()
+
+    def publish(self, type: str, data: Dict[str, Any]) -> Event:
+        self._sequence += 1
+        event = Event(id=f"{self._epoch}-{self._sequence}", type=type, data=data)
+        self._history.append(event)
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Too far behind: drop what is queued and end the stream with None.
+                self._subscribers.discard(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+        return event
+
+    def _missed(self, last_event_id: Optional[str]) -> Optional[list]:
+        """Events after `last_event_id`, or None when they can no longer be replayed."""
+        if not last_event_id:
+            return []
+        epoch, _, sequence = last_event_id.partition("-")
+        if epoch != self._epoch or not sequence.isdigit():
+            return None
+        count = self._sequence - int(sequence)
+        if count > len(self._history):
+            return None
+        history = list(self._history)
+        return history[len(history) - count:] if count > 0 else []
+
+    async def subscribe(
+        self, last_event_id: Optional[str] = None, keepalive: Optional[float] = None
+    ) -> AsyncIterator[Optional[Event]]:
+        """
+        Yields events as they are published, after replaying those since `last_event_id`.
+        Yields None whenever nothing is published for `keepalive` seconds.
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        try:
+            missed = self._missed(last_event_id)
+            if missed is None:
+                yield Event(id=f"{self._epoch}-{self._sequence}", type="reset", data={})
+                missed = []
+            for event in missed:
+                yield event
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), keepalive)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if event is None:
+                    return
+                yield event
+        finally:
+            self._subscribers.discard(queue)
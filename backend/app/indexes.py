@@ -0,0 +1,99 @@
+from datetime import datetime
+from typing import List, Type
+from beanie import Document
+from bson import ObjectId
+from pymongo import IndexModel
+from pymongo.errors import OperationFailure
+from app.models.appointemnt import Appointment
+from app.models.material import Material
+from app.models.notification import notification
+from app.models.order import DeliveryType, Order, OrderStatus
+from app.models.user import User
+
+
+# The filters and sorts the services run, explained at startup. Values are placeholders:
+# the planner picks an index from the shape of the query, not from the values.
+_ID = ObjectId()
+_RECENT = [("created_at", -1), ("_id", -1)]
+QUERY_PLANS = [
+    ("user by email", User, {"email": "someone@example.com"}, None),
+    ("users page", User, {}, _RECENT),
+    ("materials page", Material, {}, _RECENT),
+    ("materials by type", Material, {"material_type": "polycopie"}, _RECENT),
+    ("materials by year and specialite", Material, {"study_year": "1", "specialite": "medecine"}, _RECENT),
+    ("materials by module", Material, {"module": "anatomie"}, _RECENT),
+    ("materials text search", Material, {"$text": {"$search": "anatomie"}}, None),
+    ("orders page", Order, {}, _RECENT),
+    ("orders by student", Order, {"student.$id": _ID}, _RECENT),
+    ("orders by status", Order, {"status": OrderStatus.PENDING.value}, _RECENT),
+    ("orders by era", Order, {"student_era": "2025"}, _RECENT),
+    ("orders by era and status", Order, {"student_era": "2025", "status": OrderStatus.PENDING.value}, _RECENT),
+    ("orders by admin", Order, {"assigned_admin.$id": _ID}, [("created_at", -1)]),
+    ("orders out for delivery", Order,
+     {"status": OrderStatus.OUT_FOR_DELIVERY.value, "zr_tracking_id": {"$ne": None}}, None),
+    ("ready deliveries without parcel", Order,
+     {"status": OrderStatus.READY.value, "delivery_type": DeliveryType.DELIVERY.value, "zr_tracking_id": None}, None),
+    ("appointments page", Appointment, {}, _RECENT),
+    ("appointments by student", Appointment, {"student.$id": _ID}, None),
+    ("appointments by order", Appointment, {"order.$id": _ID}, None),
+    ("appointments by date", Appointment, {"scheduled_at": datetime(2025, 1, 1)}, None),
+    ("unsent notifications", notification, {"user_id.$id": _ID, "issent": False}, [("created_at", -1)]),
+    ("notifications page", notification, {}, [("created_at", -1)]),
+]
+
+
+def declared_indexes(model: Type[Document]) -> List[IndexModel]:
+    return [index for index in model.get_settings().indexes or [] if isinstance(index, IndexModel)]
+
+
+async def build_indexes(models: List[Type[Document]]) -> None:
+    """
+    Creates the indexes each model declares in its Settings, one at a time. Existing
+    indexes are left alone; an index whose build fails (the unique email index over
+    duplicate emails, say) is logged by name and does not stop the others.
+    """
+    for model in models:
+        collection = model.get_pymongo_collection()
+        for index in declared_indexes(model):
+            try:
+                await collection.create_indexes([index])
+            except OperationFailure as e:
+                print(f"Index {index.document['name']} on {model.get_collection_name()} failed: {str(e)}")
+
+
+def _stages(plan: dict):
+    yield plan.get("stage")
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            yield from _stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from _stages(child)
+
+
+async def collscan_report() -> List[str]:
+    """Names of the QUERY_PLANS whose winning plan still scans the whole collection."""
+    scans = []
+    for name, model, query, sort in QUERY_PLANS:
+        command = {"find": model.get_collection_name(), "filter": query, "limit": 1}
+        if sort:
+            command["sort"] = dict(sort)
+        try:
+            explained = await model.get_pymongo_collection().database.command(
+                "explain", command, verbosity="queryPlanner"
+            )
+        except OperationFailure as e:
+            print(f"Could not explain '{name}': {str(e)}")
+            continue
+        if "COLLSCAN" in _stages(explained["queryPlanner"]["winningPlan"]):
+            scans.append(name)
+    return scans
+
+
+async def build_indexes_and_report(models: List[Type[Document]], report: bool) -> None:
+    await build_indexes(models)
+    if report:
+        scans = await collscan_report()
+        for name in scans:
+            print(f"Query '{name}' still runs as a COLLSCAN")
+        if not scans:
+            print(f"All {len(QUERY_PLANS)} service queries are served by an index")
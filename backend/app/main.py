@@ -1,3 +1,4 @@
+import asyncio
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
 from fastapi.staticfiles import StaticFiles
@@ -10,24 +11,51 @@ from app.api.appointement import router as appointement_router
 from app.api.material import router as material_router
 from app.api.order import router as order_router
 from app.api.dashboard import router as dashboard_router
+from app.api.metrics import router as metrics_router
 from app.minio import init_minio_client
 from app.models.appointemnt import Appointment
 from app.models.material import Material
 from app.models.order import Order
 from app.api.notif import router as notif_router
 from app.models.notification import notification
+from app.models.analytics import AnalyticsRollup
+from app.models.delivery_job import DeliveryJob
+from app.indexes import build_indexes_and_report
+from app.catalog import material_catalog
+from app.services.analytics import rollupService
+from app.services.Order import orderService
 from fastapi.middleware.cors import CORSMiddleware
+from app.pagination import NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER
+from app.services.zr_service import zr_delivery_batcher, zr_express_service
+from app.tasks import start_background_tasks, stop_background_tasks
 
 
 mongo_client = AsyncMongoClient(settings.MONGO_URI)
 mongo_db = mongo_client[settings.MONGO_DB]
 
 
+document_models = [User,Material,Order,Appointment,notification,AnalyticsRollup,DeliveryJob]
+
+
 async def init_mongo():
-    await init_beanie(database=mongo_db, document_models=[User,Material,Order,Appointment,notification])
+    """
+    Initialises Beanie, then builds the indexes declared by the models, before returning
+    or, with MONGO_BUILD_INDEXES_IN_BACKGROUND, in a task while the app starts serving.
+    """
+    await init_beanie(database=mongo_db, document_models=document_models, skip_indexes=True)
+    index_build = build_indexes_and_report(document_models, report=settings.MONGO_INDEX_REPORT)
+    if settings.MONGO_BUILD_INDEXES_IN_BACKGROUND:
+        return asyncio.create_task(index_build)
+    await index_build
+    return None
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    await init_mongo()
+    index_build = await init_mongo()
+    await rollupService.ensure_built()
+    await orderService.ensure_student_eras()
+    await orderService.ensure_order_lines()
+    await material_catalog.load()
     await init_minio_client(
         minio_host=settings.MINIO_HOST,
         minio_port=settings.MINIO_PORT,
@@ -36,7 +64,14 @@ async def lifespan(app: FastAPI):
         
   
     )
+    zr_express_service.start()
+    background_tasks = start_background_tasks()
     yield
+    await stop_background_tasks(background_tasks)
+    await zr_delivery_batcher.flush()
+    await zr_express_service.close()
+    if index_build:
+        index_build.cancel()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -46,6 +81,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"], 
     allow_headers=["*"],  
+    expose_headers=[NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER],
 )
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 app.include_router(user_router)
@@ -54,4 +90,5 @@ app.include_router(material_router)
 app.include_router(order_router)
 app.include_router(notif_router)
 app.include_router(dashboard_router)
+app.include_router(metrics_router)
 
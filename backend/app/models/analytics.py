@@ -1,5 +1,8 @@
 
-from typing import List
+from datetime import datetime
+from enum import Enum
+from typing import Dict, List, Optional
+from beanie import Document
 from pydantic import BaseModel
 
 class OrderStatusPercentage(BaseModel):
@@ -31,4 +34,41 @@ class DashboardAnalytics(BaseModel):
     order_status_percentages: List[OrderStatusPercentage]
     material_type_percentages: List[MaterialTypePercentage]
     monthly_orders: List[MonthlyOrder]
-    monthly_revenue: List[MonthlyRevenue]
\ No newline at end of file
+    monthly_revenue: List[MonthlyRevenue]
+
+class TimeSeriesGranularity(str, Enum):
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+
+
+class TimeSeriesPoint(BaseModel):
+    bucket: datetime
+    orders: int
+    revenue: float
+
+
+class TimeSeries(BaseModel):
+    granularity: TimeSeriesGranularity
+    start: datetime
+    end: datetime
+    points: List[TimeSeriesPoint]
+
+
+class AnalyticsRollup(Document):
+    """
+    Precomputed counters, one document per bucket:
+    "all" for current totals, "month:YYYY-MM" and "day:YYYY-MM-DD" for
+    orders/materials bucketed by their creation date.
+    """
+    id: str
+    period: str  # "all", "month" or "day"
+    start: Optional[datetime] = None
+    orders: int = 0
+    revenue: float = 0
+    status: Dict[str, int] = {}
+    materials: Dict[str, int] = {}
+    built_at: Optional[datetime] = None  # set on "all" by rollupService.rebuild only
+
+    class Settings:
+        name = "analytics_rollups"
@@ -1,6 +1,7 @@
 from datetime import datetime
 from beanie import Document, Link
 from pydantic import BaseModel, Field
+from pymongo import IndexModel
 from app.models.order import Order
 from app.models.user import User
 
@@ -13,6 +14,14 @@ class Appointment(Document):
     location: str  # "Algiers store", etc.
     created_at : datetime = Field(default_factory=lambda: datetime.now())
 
+    class Settings:
+        indexes = [
+            IndexModel([("created_at", -1), ("_id", -1)]),
+            IndexModel([("student.$id", 1), ("created_at", -1)]),
+            IndexModel([("order.$id", 1)]),
+            IndexModel([("scheduled_at", 1)]),
+        ]
+
 class AppointmentCreate(BaseModel):
     order_id: str
     student_id: str
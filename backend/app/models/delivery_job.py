@@ -0,0 +1,41 @@
+from datetime import datetime
+from enum import Enum
+from typing import Dict, Optional
+from beanie import Document, PydanticObjectId
+from pydantic import BaseModel, Field
+from pymongo import IndexModel
+
+
+class DeliveryJobStatus(str, Enum):
+    PENDING = "pending"
+    PROCESSING = "processing"
+    DONE = "done"
+    DEAD = "dead"  # gave up after the maximum number of attempts
+
+
+class DeliveryJob(Document):
+    """Outbox entry asking for the ZR Express parcel of a ready delivery order."""
+    order_id: PydanticObjectId
+    status: DeliveryJobStatus = DeliveryJobStatus.PENDING
+    attempts: int = 0
+    next_attempt_at: datetime = Field(default_factory=datetime.utcnow)
+    locked_until: Optional[datetime] = None
+    last_error: Optional[str] = None
+    tracking_id: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    completed_at: Optional[datetime] = None
+
+    class Settings:
+        name = "delivery_jobs"
+        indexes = [
+            IndexModel([("order_id", 1)], unique=True),
+            IndexModel([("status", 1), ("next_attempt_at", 1)]),
+            IndexModel([("status", 1), ("completed_at", -1)]),
+        ]
+
+
+class DeliveryOutboxStats(BaseModel):
+    counts: Dict[DeliveryJobStatus, int]
+    queue_depth: int  # jobs waiting or being processed
+    oldest_pending_seconds: Optional[float] = None
+    average_latency_seconds: Optional[float] = None  # enqueue to tracking ID, over the last hour
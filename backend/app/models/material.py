@@ -2,6 +2,7 @@ from typing import List, Optional
 import datetime
 from beanie import Document, PydanticObjectId
 from pydantic import BaseModel, Field
+from pymongo import TEXT, IndexModel
 
 
 class Material(Document):
@@ -13,12 +14,25 @@ class Material(Document):
     image_urls: List[str] = []
     material_type: str     # "polycopie" or "book"
     price_dzd: float 
-    pdf_url: Optional[str]     
+    pdf_url: Optional[str] = None
     created_at: datetime.datetime = Field(default_factory=lambda: datetime.datetime.now())
      
     
     class Settings:
         name = "material"
+        indexes = [
+            IndexModel([("created_at", -1), ("_id", -1)]),
+            IndexModel([("material_type", 1), ("created_at", -1), ("_id", -1)]),
+            IndexModel([("study_year", 1), ("specialite", 1), ("created_at", -1), ("_id", -1)]),
+            IndexModel([("specialite", 1), ("created_at", -1), ("_id", -1)]),
+            IndexModel([("module", 1), ("created_at", -1), ("_id", -1)]),
+            IndexModel(
+                [("title", TEXT), ("module", TEXT), ("specialite", TEXT), ("description", TEXT)],
+                name="material_text",
+                default_language="french",
+                weights={"title": 10, "module": 5, "specialite": 3, "description": 1},
+            ),
+        ]
         
 class materialUser(BaseModel):
     id: PydanticObjectId = Field(..., alias="_id")
@@ -36,4 +50,18 @@ class materialUser(BaseModel):
         "from_attributes": True     
     }
     
-    
\ No newline at end of file
+    
+
+class FacetCount(BaseModel):
+    value: Optional[str] = None
+    count: int
+
+
+class MaterialFacets(BaseModel):
+    """A page of filtered materials with the number of matches per facet value."""
+    items: List[materialUser]
+    total: int
+    material_type: List[FacetCount]
+    study_year: List[FacetCount]
+    specialite: List[FacetCount]
+    module: List[FacetCount]
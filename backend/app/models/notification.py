@@ -1,5 +1,6 @@
 from datetime import datetime
 from beanie import Document, Link
+from pymongo import IndexModel
 from app.models.user import User
 
 
@@ -10,4 +11,8 @@ class notification (Document):
     created_at : datetime
     
     class Settings:
-        name = "notifications"
\ No newline at end of file
+        name = "notifications"
+        indexes = [
+            IndexModel([("user_id.$id", 1), ("issent", 1), ("created_at", -1)]),
+            IndexModel([("created_at", -1)]),
+        ]
@@ -1,7 +1,8 @@
 from datetime import datetime
 from enum import Enum
-from typing import List, Optional
-from beanie import Document, Link
+from typing import Any, Dict, List, Optional
+from beanie import Document, Link, PydanticObjectId
+from pymongo import IndexModel
 from bson import ObjectId
 from pydantic import BaseModel, ConfigDict, Field
 from app.models.user import User
@@ -19,18 +20,140 @@ class OrderStatus(str, Enum):
 class DeliveryType(str, Enum):
     PICKUP = "pickup"  # Client picks up at lbureau
     DELIVERY = "delivery"  # ZR Express delivery a domicile
+
+class ExportFormat(str, Enum):
+    CSV = "csv"
+    NDJSON = "ndjson"
   
+class OrderLine(BaseModel):
+    """Snapshot of a material as it was ordered, so totals never depend on later price edits."""
+    material_id: PydanticObjectId
+    title: str
+    material_type: str
+    unit_price_dzd: float
+    quantity: int
+    line_total_dzd: float
+    image_urls: List[str] = []
+    description: Optional[str] = None
+    module: Optional[str] = None
+    study_year: Optional[str] = None
+    specialite: Optional[str] = None
+    material_created_at: Optional[datetime] = None  # None only when the material was gone before the backfill
+
+    @classmethod
+    def snapshot(cls, material: Material, quantity: int) -> "OrderLine":
+        return cls(
+            material_id=material.id,
+            title=material.title,
+            material_type=material.material_type,
+            unit_price_dzd=material.price_dzd,
+            quantity=quantity,
+            line_total_dzd=material.price_dzd * quantity,
+            image_urls=material.image_urls,
+            description=material.description,
+            module=material.module,
+            study_year=material.study_year,
+            specialite=material.specialite,
+            material_created_at=material.created_at,
+        )
+
+class DeliveryTracking(BaseModel):
+    """Latest ZR Express state of a parcel, refreshed by the delivery status poller."""
+    situation: Optional[str] = None
+    parcel: Dict[str, Any] = {}
+    updated_at: Optional[datetime] = None  # when the situation last changed
+    checked_at: datetime
+    retry_after: Optional[datetime] = None  # set when a live lookup found nothing; no new one before then
+
 class Order(Document):
     student: Link[User]
-    item : List[tuple[Link[Material], int]]
+    student_era: Optional[str] = None  # copy of student.era, kept in sync by orderService.set_student_era
+    item : List[tuple[Link[Material], int]] = []  # full material copies, only on orders placed before `lines`
+    lines: List[OrderLine] = []
+    total_dzd: Optional[float] = None  # None until backfilled on orders placed before line snapshots
     status: OrderStatus = OrderStatus.PENDING 
     appointment_date: Optional[datetime] = None
-    created_at: datetime = datetime.utcnow()
+    created_at: datetime = Field(default_factory=datetime.utcnow)
     assigned_admin: Optional[Link[User]]  = None
     delivery_type: DeliveryType = DeliveryType.PICKUP
     delivery_address: Optional[str] = None
     delivery_phone: Optional[str] = None
     zr_tracking_id: Optional[str] = None
+    delivery_tracking: Optional[DeliveryTracking] = None
+    transition_token: Optional[PydanticObjectId] = None  # set by orderService.bulk_transition on the orders it moved
+
+    class Settings:
+        indexes = [
+            IndexModel([("created_at", -1), ("_id", -1)]),
+            IndexModel([("student.$id", 1), ("created_at", -1), ("_id", -1)]),
+            IndexModel([("status", 1), ("created_at", -1), ("_id", -1)]),
+            IndexModel([("student_era", 1), ("created_at", -1), ("_id", -1)]),
+            IndexModel([("student_era", 1), ("status", 1), ("created_at", -1), ("_id", -1)]),
+            IndexModel([("assigned_admin.$id", 1), ("created_at", -1)]),
+        ]
+
+def student_lookup_stage(*fields: str) -> dict:
+    """
+    $lookup stage joining the student linked by `Order.student` (stored as a DBRef)
+    into `student_doc`, keeping only `fields`.
+    """
+    return {
+        "$lookup": {
+            "from": User.get_collection_name(),
+            "let": {"student_id": {"$getField": {"field": {"$literal": "$id"}, "input": "$student"}}},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$_id", "$$student_id"]}}},
+                {"$project": {field: 1 for field in fields}},
+            ],
+            "as": "student_doc",
+        }
+    }
+
+def order_total(order: Order) -> float:
+    if order.total_dzd is not None:
+        return order.total_dzd
+    return sum(line.line_total_dzd for line in order.lines)
+
+
+# Aggregation expression rebuilding `lines` from the material copies in `item`,
+# for orders placed before line snapshots existed.
+LEGACY_LINES_EXPR = {
+    "$map": {
+        "input": {"$ifNull": ["$item", []]},
+        "as": "entry",
+        "in": {
+            "$let": {
+                "vars": {
+                    "material": {"$arrayElemAt": ["$$entry", 0]},
+                    "quantity": {"$arrayElemAt": ["$$entry", 1]},
+                },
+                "in": {
+                    "material_id": "$$material._id",
+                    "title": "$$material.title",
+                    "material_type": "$$material.material_type",
+                    "unit_price_dzd": {"$ifNull": ["$$material.price_dzd", 0]},
+                    "quantity": "$$quantity",
+                    "line_total_dzd": {"$multiply": [{"$ifNull": ["$$material.price_dzd", 0]}, "$$quantity"]},
+                    "image_urls": {"$ifNull": ["$$material.image_urls", []]},
+                    "description": "$$material.description",
+                    "module": "$$material.module",
+                    "study_year": "$$material.study_year",
+                    "specialite": "$$material.specialite",
+                    "material_created_at": {"$ifNull": ["$$material.created_at", None]},
+                },
+            }
+        },
+    }
+}
+
+# The order's `lines`, falling back to LEGACY_LINES_EXPR when it has none.
+ORDER_LINES_EXPR = {
+    "$cond": [
+        {"$gt": [{"$size": {"$ifNull": ["$lines", []]}}, 0]},
+        "$lines",
+        LEGACY_LINES_EXPR,
+    ]
+}
 
 # Student Places Order -> pending
 # Admin Accepts & Starts Printing -> printing
@@ -47,6 +170,19 @@ class OrderCreate(BaseModel):
     
 
 
+class BulkTransitionRequest(BaseModel):
+    order_ids: List[str]
+    status: OrderStatus
+    appointment_date: Optional[datetime] = None
+
+
+class BulkTransitionResult(BaseModel):
+    order_id: str
+    success: bool
+    status: Optional[OrderStatus] = None
+    detail: Optional[str] = None
+
+
 class orderResponse(BaseModel):
     id : str = Field(alias="_id")
     appointment_date : Optional[datetime]
@@ -61,6 +197,26 @@ class orderResponse(BaseModel):
     }
     
 
+def line_material(line: OrderLine, order: Order, id_key: str = "_id") -> dict:
+    """
+    An order line in the materialUser shape of `orderResponse.item`, from the material
+    fields snapshotted with it. A line whose material was deleted before the backfill
+    has no creation date, and falls back to the order's.
+    """
+    return {
+        id_key: str(line.material_id),
+        "title": line.title,
+        "description": line.description,
+        "image_urls": line.image_urls,
+        "material_type": line.material_type,
+        "module": line.module,
+        "study_year": line.study_year,
+        "specialite": line.specialite,
+        "price_dzd": line.unit_price_dzd,
+        "created_at": line.material_created_at or order.created_at,
+    }
+
+
 def serialize_order(order: Order):
     return {
         "id": str(order.id),
@@ -69,20 +225,23 @@ def serialize_order(order: Order):
         "delivery_type": order.delivery_type,
         "delivery_address": order.delivery_address,
         "zr_tracking_id": order.zr_tracking_id,
-        "item": [
-            (
-                {
-                    "id": str(material.id),
-                    "title": material.title,
-                    "description": material.description,
-                    "image_urls": material.image_urls,
-                    "material_type": material.material_type,
-                    "price_dzd": material.price_dzd,
-                },
-                qty,
-            )
-            for material, qty in order.item
-        ],
+        "item": [(line_material(line, order, id_key="id"), line.quantity) for line in order.lines],
+    }
+
+
+def serialize_order_response(order: Order):
+    """
+    serialize_order in the exact wire shape of `orderResponse`,
+    for responses sent without response_model validation.
+    """
+    return {
+        "_id": str(order.id),
+        "appointment_date": order.appointment_date,
+        "status": order.status,
+        "item": [(line_material(line, order), line.quantity) for line in order.lines],
+        "delivery_type": order.delivery_type,
+        "delivery_address": order.delivery_address,
+        "zr_tracking_id": order.zr_tracking_id,
     }
 
 
@@ -96,14 +255,15 @@ def serialize_order_F(order: Order, user: User = None):
         "item": [
             (
                 {
-                    "title": material.title,
-                    "material_type": material.material_type,
-                    "price_dzd": material.price_dzd,
+                    "title": line.title,
+                    "material_type": line.material_type,
+                    "price_dzd": line.unit_price_dzd,
                 },
-                int(qty),
+                line.quantity,
             )
-            for material, qty in order.item
+            for line in order.lines
         ],
+        "total_dzd": order_total(order),
         "status": order.status.value,
         "delivery_type": order.delivery_type.value,
         "delivery_address": order.delivery_address,
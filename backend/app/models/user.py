@@ -1,6 +1,7 @@
 from enum import Enum
-from beanie import Document
+from beanie import Document, PydanticObjectId
 from pydantic import BaseModel, Field, EmailStr, field_validator
+from pymongo import IndexModel
 from datetime import datetime
 from typing import Optional, List
 
@@ -25,6 +26,17 @@ class User(Document):
     reset_code_expires: Optional[datetime] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
+    class Settings:
+        indexes = [
+            IndexModel([("email", 1)], unique=True, name="email_unique"),
+            IndexModel([("created_at", -1), ("_id", -1)]),
+        ]
+
+
+class StudentEra(BaseModel):
+    id: PydanticObjectId = Field(alias="_id")
+    era: Optional[str] = None
+
 
 class UserCreate(BaseModel):
     email : str
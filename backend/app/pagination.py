@@ -0,0 +1,57 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Sequence, Tuple
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException, Response
+from app.config import settings
+
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+TOTAL_COUNT_HEADER = "X-Total-Count"
+
+# Keyset order shared by every cursor-paginated listing; each has a matching
+# (created_at, _id) compound index so a page costs the same at any depth.
+KEYSET_SORT = [("created_at", -1), ("_id", -1)]
+
+
+def encode_cursor(created_at: datetime, id: ObjectId) -> str:
+    payload = json.dumps({"t": created_at.isoformat(), "id": str(id)})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(payload["t"]), ObjectId(payload["id"])
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def after_cursor(cursor: Optional[str]) -> dict:
+    """Query fragment matching the documents that follow `cursor` in KEYSET_SORT order."""
+    if not cursor:
+        return {}
+    created_at, id = decode_cursor(cursor)
+    return {
+        "$or": [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": id}},
+        ]
+    }
+
+
+def page_limit(limit: int) -> int:
+    return max(1, min(limit, settings.MAX_PAGE_SIZE))
+
+
+def set_next_cursor(response: Response, items: Sequence, limit: int) -> None:
+    """Advertises the cursor of the next page when `items` filled the page."""
+    if items and len(items) >= limit:
+        last = items[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last.created_at, last.id)
+
+
+def set_total_count(response: Response, total: int) -> None:
+    response.headers[TOTAL_COUNT_HEADER] = str(total)
@@ -1,24 +1,134 @@
 from fastapi import HTTPException
-from app.models.order import Order, OrderCreate, OrderStatus, DeliveryType
-from app.models.user import User
+from app.models.order import LEGACY_LINES_EXPR, ORDER_LINES_EXPR, BulkTransitionResult, DeliveryTracking, Order, OrderCreate, OrderLine, OrderStatus, DeliveryType, student_lookup_stage
+from app.models.user import StudentEra, User
 from app.models.material import Material
-from app.services.zr_service import zr_express_service
-from typing import List, Optional
-from datetime import datetime
+from app.models.delivery_job import DeliveryJob
+from app.services.zr_service import zr_delivery_batcher, zr_express_service
+from app.services.delivery_outbox import deliveryOutboxService
+from app.services.analytics import rollupService
+from app.pagination import KEYSET_SORT, after_cursor
+from app.events import EventBus
+from app.config import settings
+from typing import Any, Dict, List, Optional
+from datetime import datetime, timedelta
 from beanie import PydanticObjectId 
+from beanie.operators import In, Set
+from beanie.odm.queries.update import UpdateResponse
+from beanie.odm.queries.aggregation import AggregationQuery
+from bson import ObjectId
+from pymongo import UpdateOne
+
+
+# Statuses an order may be moved out of, per target status of an admin transition.
+TRANSITION_SOURCES = {
+    OrderStatus.PRINTING: [OrderStatus.PENDING],
+    OrderStatus.READY: [OrderStatus.PRINTING],
+    OrderStatus.DELIVERED: [OrderStatus.READY, OrderStatus.OUT_FOR_DELIVERY],
+}
+
+
+def transition_error(order: Order, target: OrderStatus, admin: User) -> Optional[str]:
+    """Why `admin` may not move `order` to `target`, or None when the transition is valid."""
+    sources = TRANSITION_SOURCES.get(target)
+    if sources is None:
+        return f"Orders cannot be moved to '{target.value}'"
+    if order.status not in sources:
+        return f"Order is '{order.status.value}', expected one of: {', '.join(s.value for s in sources)}"
+    if target == OrderStatus.DELIVERED:
+        if order.status == OrderStatus.OUT_FOR_DELIVERY and order.delivery_type != DeliveryType.DELIVERY:
+            return "Only delivery orders can be out for delivery"
+        if order.delivery_type == DeliveryType.PICKUP and (
+            not order.assigned_admin or order.assigned_admin.to_ref().id != admin.id
+        ):
+            return "Pickup orders can only be delivered by their assigned admin"
+    return None
+
+
+def transition_filter(target: OrderStatus, admin: User) -> dict:
+    """Query matching the orders `admin` may move to `target`; the database-side twin of transition_error."""
+    sources = [status.value for status in TRANSITION_SOURCES[target]]
+    if target != OrderStatus.DELIVERED:
+        return {"status": {"$in": sources}}
+    return {
+        "$or": [
+            {"delivery_type": DeliveryType.DELIVERY.value, "status": {"$in": sources}},
+            {
+                "delivery_type": {"$ne": DeliveryType.DELIVERY.value},
+                "status": {"$in": [s for s in sources if s != OrderStatus.OUT_FOR_DELIVERY.value]},
+                "assigned_admin.$id": admin.id,
+            },
+        ]
+    }
+
+# Created, transitioned and deleted orders, streamed to admin consoles by GET /orders/events.
+order_events = EventBus(history=settings.ORDER_EVENTS_HISTORY)
+
+
+def publish_order_event(type: str, order: Order, previous_status: Optional[OrderStatus] = None) -> None:
+    order_events.publish(type, {
+        "order_id": str(order.id),
+        "status": order.status.value,
+        "previous_status": previous_status.value if previous_status else None,
+        "student_era": order.student_era,
+        "delivery_type": order.delivery_type.value,
+        "zr_tracking_id": order.zr_tracking_id,
+    })
+
+
+# Material fields copied into an order line; pdf_url is left out.
+ORDER_MATERIAL_FIELDS = [
+    "title", "study_year", "specialite", "module", "description",
+    "image_urls", "material_type", "price_dzd", "created_at",
+]
+
+# One row per order line; keys of the export projection, in column order.
+ORDER_EXPORT_FIELDS = {
+    "order_id": {"$toString": "$_id"},
+    "created_at": "$created_at",
+    "status": "$status",
+    "delivery_type": "$delivery_type",
+    "delivery_address": "$delivery_address",
+    "delivery_phone": "$delivery_phone",
+    "zr_tracking_id": "$zr_tracking_id",
+    "student_name": "$student_doc.full_name",
+    "student_email": "$student_doc.email",
+    "student_phone": "$student_doc.phone_number",
+    "student_era": "$student_doc.era",
+    "material_id": {"$toString": "$line.material_id"},
+    "material_title": "$line.title",
+    "material_type": "$line.material_type",
+    "unit_price_dzd": "$line.unit_price_dzd",
+    "quantity": "$line.quantity",
+    "line_total_dzd": "$line.line_total_dzd",
+}
 
 
 class orderService:
 
     @staticmethod
-    async def create_order(student: User, items: List[OrderCreate]) -> Order:
-        order_items: List[tuple[Material, int]] = []
+    async def get_order_materials(material_ids: List[str]) -> Dict[str, Material]:
+        """
+        Fetches every material referenced by a cart in one $in query, keyed by
+        str(PydanticObjectId(id)), whatever the case of the requested hex.
+        Only the fields copied into an order are loaded; unknown or invalid ids are left out.
+        """
+        object_ids = list({ObjectId(material_id) for material_id in material_ids if ObjectId.is_valid(material_id)})
+        if not object_ids:
+            return {}
+        cursor = Material.get_pymongo_collection().find({"_id": {"$in": object_ids}}, ORDER_MATERIAL_FIELDS)
+        return {str(doc["_id"]): Material.model_validate(doc) async for doc in cursor}
 
-        for item in items:
-            material = await Material.get(item.materiel_id)
-            if not material:
-                raise HTTPException(status_code=404, detail=f"Material not found: {item.materiel_id}")
-            order_items.append((material, item.quantity))
+    @staticmethod
+    async def create_order(student: User, items: List[OrderCreate]) -> Order:
+        keys = [
+            str(PydanticObjectId(item.materiel_id)) if ObjectId.is_valid(item.materiel_id) else item.materiel_id
+            for item in items
+        ]
+        materials = await orderService.get_order_materials(keys)
+        missing = list(dict.fromkeys(item.materiel_id for item, key in zip(items, keys) if key not in materials))
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Material not found: {', '.join(missing)}")
+        lines = [OrderLine.snapshot(materials[key], item.quantity) for item, key in zip(items, keys)]
 
         
         delivery_type = items[0].delivery_type if items else DeliveryType.PICKUP
@@ -27,110 +137,449 @@ class orderService:
 
         order = Order(
             student=student,
-            item=order_items,
+            student_era=student.era,
+            lines=lines,
+            total_dzd=sum(line.line_total_dzd for line in lines),
             delivery_type=delivery_type,
             delivery_address=delivery_address,
             delivery_phone=delivery_phone
         )
         await order.insert()
+        await rollupService.record_order_created(order)
+        publish_order_event("order.created", order)
         return order
 
     @staticmethod
-    async def get_orders_by_student(student_id: str) -> List[Order]:
-        return await Order.find(Order.student.id == PydanticObjectId(student_id)).sort("-created_at").to_list()
+    async def get_orders_by_student(
+        student_id: str,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+    ) -> List[Order]:
+        query = {"student.$id": PydanticObjectId(student_id), **after_cursor(cursor)}
+        orders = Order.find(query).sort(KEYSET_SORT)
+        if limit:
+            orders = orders.limit(limit)
+        return await orders.to_list()
+
+    @staticmethod
+    async def get_all_orders(
+        status: Optional[OrderStatus] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+    ) -> List[Order]:
+        query = after_cursor(cursor)
+        if status:
+            query["status"] = status.value
+        orders = Order.find(query).sort(KEYSET_SORT)
+        if limit:
+            orders = orders.limit(limit)
+        return await orders.to_list()
 
     @staticmethod
-    async def get_all_orders(status: Optional[OrderStatus] = None) -> List[Order]:
+    async def get_orders_by_era(
+        era: str,
+        status: Optional[OrderStatus] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+    ) -> List[Order]:
+        query = {"student_era": era, **after_cursor(cursor)}
         if status:
-            return await Order.find(Order.status == status).sort("-created_at").to_list()
-        return await Order.find_all().sort("-created_at").to_list()
+            query["status"] = status.value
+        orders = Order.find(query).sort(KEYSET_SORT)
+        if limit:
+            orders = orders.limit(limit)
+        return await orders.to_list()
+
+    @staticmethod
+    async def get_students(orders: List[Order]) -> Dict[PydanticObjectId, User]:
+        """Resolves the students of `orders` with one $in query."""
+        student_ids = list({order.student.to_ref().id for order in orders})
+        if not student_ids:
+            return {}
+        students = await User.find(In(User.id, student_ids)).to_list()
+        return {student.id: student for student in students}
+
+    @staticmethod
+    async def set_student_era(student_id: PydanticObjectId, era: Optional[str]) -> None:
+        await Order.find(Order.student.id == student_id).update(Set({Order.student_era: era}))
+
+    @staticmethod
+    async def backfill_student_era(batch_size: int = 1000) -> int:
+        """
+        Copies each student's era onto their orders, one update per era and batch of students.
+        Returns the number of orders modified.
+        """
+        modified = 0
+        eras: Dict[Optional[str], List[PydanticObjectId]] = {}
+        async for student in User.find_all(projection_model=StudentEra):
+            eras.setdefault(student.era, []).append(student.id)
+        for era, student_ids in eras.items():
+            for i in range(0, len(student_ids), batch_size):
+                result = await Order.get_pymongo_collection().update_many(
+                    {"student.$id": {"$in": student_ids[i:i + batch_size]}, "student_era": {"$ne": era}},
+                    {"$set": {"student_era": era}},
+                )
+                modified += result.modified_count
+        return modified
+
+    @staticmethod
+    async def ensure_student_eras() -> None:
+        """Runs the student_era backfill while any order predates the field."""
+        collection = Order.get_pymongo_collection()
+        if await collection.find_one({"student_era": {"$exists": False}}, {"_id": 1}):
+            modified = await orderService.backfill_student_era()
+            # Orders of deleted students have no era to copy; mark them so the check stays cheap.
+            await collection.update_many({"student_era": {"$exists": False}}, {"$set": {"student_era": None}})
+            print(f"Set student_era on {modified} orders")
+
+    @staticmethod
+    async def ensure_order_lines() -> None:
+        """Runs the order lines backfill once per database, so every order can be read from `lines` alone."""
+        migrations = Order.get_pymongo_collection().database["migrations"]
+        if await migrations.find_one({"_id": "order_line_materials"}):
+            return
+        modified = await orderService.backfill_order_lines()
+        await migrations.update_one({"_id": "order_line_materials"}, {"$set": {"done_at": datetime.utcnow()}}, upsert=True)
+        print(f"Snapshotted the lines of {modified} orders")
+
+    @staticmethod
+    async def backfill_order_lines(batch_size: int = 1000) -> int:
+        """
+        Fills `lines` and `total_dzd` on orders placed before line snapshots, from the
+        material copies in their `item`, one server-side update per batch. Lines that
+        predate the material fields of OrderLine get them from `item` too, or from the
+        material itself on orders that have no `item`.
+        Returns the number of orders modified.
+        """
+        modified = 0
+        collection = Order.get_pymongo_collection()
+        legacy = {
+            "$or": [
+                {"total_dzd": None},
+                {"item.0": {"$exists": True}, "lines.0": {"$exists": True}, "lines.material_created_at": {"$exists": False}},
+            ]
+        }
+        while True:
+            order_ids = [
+                doc["_id"]
+                async for doc in collection.find(legacy, {"_id": 1}).limit(batch_size)
+            ]
+            if not order_ids:
+                break
+            result = await collection.update_many(
+                {"_id": {"$in": order_ids}},
+                [
+                    {"$set": {"lines": LEGACY_LINES_EXPR}},
+                    {"$set": {"total_dzd": {"$sum": "$lines.line_total_dzd"}}},
+                ],
+            )
+            modified += result.modified_count
+
+        unsnapshotted = {"lines.0": {"$exists": True}, "lines.material_created_at": {"$exists": False}}
+        while True:
+            orders = [doc async for doc in collection.find(unsnapshotted, {"lines": 1}).limit(batch_size)]
+            if not orders:
+                return modified
+            material_ids = list({line["material_id"] for order in orders for line in order["lines"]})
+            materials = {
+                doc["_id"]: doc
+                async for doc in Material.get_pymongo_collection().find({"_id": {"$in": material_ids}}, ORDER_MATERIAL_FIELDS)
+            }
+            operations = []
+            for order in orders:
+                lines = []
+                for line in order["lines"]:
+                    material = materials.get(line["material_id"], {})
+                    # A deleted material leaves the fields null, which still marks the line as done.
+                    lines.append({
+                        **line,
+                        **{field: material.get(field) for field in ("description", "module", "study_year", "specialite")},
+                        "material_created_at": material.get("created_at"),
+                    })
+                operations.append(UpdateOne({"_id": order["_id"]}, {"$set": {"lines": lines}}))
+            result = await collection.bulk_write(operations, ordered=False)
+            modified += result.modified_count
+
+    @staticmethod
+    def export_order_lines(
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        status: Optional[OrderStatus] = None,
+    ) -> AggregationQuery:
+        """
+        Cursor over every order line in [start, end), oldest first, with student and
+        material fields denormalized so consumers never need per-row lookups.
+        """
+        match: dict = {}
+        if start or end:
+            match["created_at"] = {}
+            if start:
+                match["created_at"]["$gte"] = start
+            if end:
+                match["created_at"]["$lt"] = end
+        if status:
+            match["status"] = status.value
+
+        pipeline = [
+            {"$match": match},
+            {"$sort": {"created_at": 1}},
+            student_lookup_stage("full_name", "email", "phone_number", "era"),
+            {"$unwind": {"path": "$student_doc", "preserveNullAndEmptyArrays": True}},
+            {"$addFields": {"line": ORDER_LINES_EXPR}},
+            {"$unwind": "$line"},
+            {"$project": {"_id": 0, **ORDER_EXPORT_FIELDS}},
+        ]
+        return Order.aggregate(pipeline, batchSize=1000)
 
     @staticmethod
     async def get_orders_by_admin(admin_id: str) -> List[Order]:
-        return await Order.find(Order.assigned_admin == PydanticObjectId(admin_id)).sort("-created_at").to_list()
+        return await Order.find(Order.assigned_admin.id == PydanticObjectId(admin_id)).sort("-created_at").to_list()
 
     @staticmethod
-    async def accept_order_for_printing(order_id: str, admin: User) -> Optional[Order]:
-        order = await Order.get(order_id)
-        if not order or order.status != OrderStatus.PENDING:
+    async def _transition(order_id: str, target: OrderStatus, admin: User, **changes) -> Optional[Order]:
+        """
+        Moves one order to `target` with a single conditional find_one_and_update,
+        so two admins can never both apply the same transition.
+        Returns None when the order does not exist or is not in a valid state for it.
+        """
+        if not ObjectId.is_valid(order_id):
+            return None
+        update = {"status": target.value}
+        update.update({
+            field: value.to_ref() if isinstance(value, User) else value
+            for field, value in changes.items()
+        })
+        order = await Order.find_one(
+            {"_id": ObjectId(order_id), **transition_filter(target, admin)}
+        ).update({"$set": update}, response_type=UpdateResponse.OLD_DOCUMENT)
+        if order is None:
             return None
-        order.status = OrderStatus.PRINTING
-        order.assigned_admin = admin
-        await order.save()
+
+        previous_status = order.status
+        order.status = target
+        for field, value in changes.items():
+            setattr(order, field, value)
+        await rollupService.record_order_transition(order, previous_status)
+        publish_order_event("order.transitioned", order, previous_status)
         return order
 
+    @staticmethod
+    async def accept_order_for_printing(order_id: str, admin: User) -> Optional[Order]:
+        return await orderService._transition(order_id, OrderStatus.PRINTING, admin, assigned_admin=admin)
+
     @staticmethod
     async def mark_order_as_ready(order_id: str, appointment_date: datetime, admin: User) -> Optional[Order]:
-        order = await Order.get(order_id)
-        if not order or order.status != OrderStatus.PRINTING:
+        order = await orderService._transition(
+            order_id, OrderStatus.READY, admin, appointment_date=appointment_date, assigned_admin=admin
+        )
+        if not order:
             return None
         
         
-        order.status = OrderStatus.READY
-        order.appointment_date = appointment_date
-        order.assigned_admin = admin
-        
-        
         if order.delivery_type == DeliveryType.DELIVERY:
-            try:
-                
-                student = await order.student.fetch()
-                
-                
-                tracking_id = await zr_express_service.create_delivery(order, student)
-                
-                if tracking_id:
-                    order.zr_tracking_id = tracking_id
-                    order.status = OrderStatus.OUT_FOR_DELIVERY
-                    print(f"Order {order_id} sent to ZR Express with tracking ID: {tracking_id}")
-                else:
-                    print(f"Failed to create ZR Express delivery for order {order_id}")
-                    
-                    
-            except Exception as e:
-                print(f"Error creating ZR Express delivery for order {order_id}: {str(e)}")
-                
+            await deliveryOutboxService.enqueue([order.id])
         
-        await order.save()
         return order
 
+    @staticmethod
+    async def enqueue_missing_deliveries() -> int:
+        """
+        Enqueues the delivery job of every ready delivery order that has neither a parcel nor
+        a job, which happens when the process stops between the READY transition and its
+        enqueue. Enqueueing is idempotent, so racing a transition in progress is harmless.
+        Returns the number of orders enqueued.
+        """
+        rows = await Order.aggregate([
+            {"$match": {
+                "status": OrderStatus.READY.value,
+                "delivery_type": DeliveryType.DELIVERY.value,
+                "zr_tracking_id": None,
+            }},
+            {"$lookup": {
+                "from": DeliveryJob.get_collection_name(),
+                "localField": "_id",
+                "foreignField": "order_id",
+                "pipeline": [{"$project": {"_id": 1}}],
+                "as": "jobs",
+            }},
+            {"$match": {"jobs": {"$size": 0}}},
+            {"$project": {"_id": 1}},
+        ]).to_list()
+        await deliveryOutboxService.enqueue([row["_id"] for row in rows])
+        return len(rows)
+
+    @staticmethod
+    async def _set_out_for_delivery(order: Order, tracking_id: str) -> None:
+        result = await Order.find_one(
+            {"_id": order.id, "status": OrderStatus.READY.value}
+        ).update({"$set": {"zr_tracking_id": tracking_id, "status": OrderStatus.OUT_FOR_DELIVERY.value}})
+        if result.modified_count:
+            order.zr_tracking_id = tracking_id
+            order.status = OrderStatus.OUT_FOR_DELIVERY
+            await rollupService.record_order_transition(order, OrderStatus.READY)
+            publish_order_event("order.transitioned", order, OrderStatus.READY)
+
     @staticmethod
     async def mark_order_as_delivered(order_id: str, admin: User) -> Optional[Order]:
-        order = await Order.get(order_id)
-        if not order:
-            return None
-            
-        
-        valid_statuses = [OrderStatus.READY]
-        if order.delivery_type == DeliveryType.DELIVERY:
-            valid_statuses.append(OrderStatus.OUT_FOR_DELIVERY)
-            
-        if order.status not in valid_statuses:
-            return None
+        return await orderService._transition(order_id, OrderStatus.DELIVERED, admin)
 
-        
-        if order.delivery_type == DeliveryType.PICKUP:
-            if str(order.assigned_admin) != str(admin.id):
-                return None
+    @staticmethod
+    async def bulk_transition(
+        order_ids: List[str],
+        target: OrderStatus,
+        admin: User,
+        appointment_date: Optional[datetime] = None,
+    ) -> List[BulkTransitionResult]:
+        """
+        Moves many orders to `target` with one read and one bulk_write, each update
+        guarded by the status it was validated against. Delivery orders that become
+        ready are then sent to ZR Express in a single batch.
+        """
+        # One key per order, so ids differing only in hex case share a result.
+        order_ids = list(dict.fromkeys(
+            str(ObjectId(order_id)) if ObjectId.is_valid(order_id) else order_id
+            for order_id in order_ids
+        ))
+        results: Dict[str, BulkTransitionResult] = {}
+        object_ids = []
+        for order_id in order_ids:
+            if ObjectId.is_valid(order_id):
+                object_ids.append(ObjectId(order_id))
+            else:
+                results[order_id] = BulkTransitionResult(order_id=order_id, success=False, detail="Invalid order ID")
 
-        order.status = OrderStatus.DELIVERED
-        await order.save()
-        return order
+        orders = {str(order.id): order for order in await Order.find(In(Order.id, object_ids)).to_list()}
+        # Marks the orders this call moved, so a concurrent move to the same status is not taken for ours.
+        token = ObjectId()
+        changes: Dict[str, Any] = {"status": target.value, "transition_token": token}
+        if target in (OrderStatus.PRINTING, OrderStatus.READY):
+            changes["assigned_admin"] = admin.to_ref()
+        if target == OrderStatus.READY:
+            changes["appointment_date"] = appointment_date
+
+        candidates: List[Order] = []
+        operations = []
+        for object_id in object_ids:
+            order_id = str(object_id)
+            order = orders.get(order_id)
+            error = "Order not found" if order is None else transition_error(order, target, admin)
+            if error:
+                results[order_id] = BulkTransitionResult(order_id=order_id, success=False, status=order.status if order else None, detail=error)
+                continue
+            candidates.append(order)
+            operations.append(UpdateOne(
+                {"$and": [{"_id": order.id, "status": order.status.value}, transition_filter(target, admin)]},
+                {"$set": changes},
+            ))
+
+        applied = candidates
+        if operations:
+            write = await Order.get_pymongo_collection().bulk_write(operations, ordered=False)
+            if write.modified_count < len(operations):
+                # Some orders changed concurrently; keep only those this call's updates moved.
+                moved = set(await Order.get_pymongo_collection().distinct(
+                    "_id", {"_id": {"$in": [order.id for order in candidates]}, "transition_token": token}
+                ))
+                applied = [order for order in candidates if order.id in moved]
+
+        transitions = []
+        for order in applied:
+            transitions.append((order, order.status))
+            order.status = target
+            if target == OrderStatus.READY:
+                order.appointment_date = appointment_date
+        await rollupService.record_order_transitions(transitions)
+        for order, previous_status in transitions:
+            publish_order_event("order.transitioned", order, previous_status)
+
+        for order in candidates:
+            if order.status == target:
+                results[str(order.id)] = BulkTransitionResult(order_id=str(order.id), success=True, status=target)
+            else:
+                results[str(order.id)] = BulkTransitionResult(order_id=str(order.id), success=False, status=order.status, detail="Order changed concurrently")
+
+        if target == OrderStatus.READY:
+            deliveries = [order for order in applied if order.delivery_type == DeliveryType.DELIVERY]
+            await deliveryOutboxService.enqueue([order.id for order in deliveries])
+            for order in deliveries:
+                results[str(order.id)].detail = "Delivery creation queued"
+
+        return [results[order_id] for order_id in order_ids]
+
+    @staticmethod
+    async def process_delivery_jobs(limit: int) -> int:
+        """
+        Claims up to `limit` delivery outbox jobs and creates their ZR Express parcels in one batch.
+        Failed jobs are retried with backoff by the outbox. Returns the number of jobs claimed.
+        """
+        if not zr_express_service.breaker.allows_calls():
+            # Leave the jobs queued instead of spending their attempts on a fail-fast.
+            return 0
+        jobs = await deliveryOutboxService.claim(limit)
+        if not jobs:
+            return 0
+        orders = {
+            order.id: order
+            for order in await Order.find(In(Order.id, [job.order_id for job in jobs])).to_list()
+        }
+
+        operations = []
+        pending = []
+        for job in jobs:
+            order = orders.get(job.order_id)
+            if order is None or order.status != OrderStatus.READY or order.zr_tracking_id:
+                operations.append(deliveryOutboxService.completed(
+                    job, order.zr_tracking_id if order else None, note="Order no longer awaiting a delivery"
+                ))
+                continue
+            pending.append((job, order))
+
+        # A retried job's earlier add_colis may have succeeded after timing out on our side.
+        retried = [zr_express_service.tracking_id(order) for job, order in pending if job.attempts > 1]
+        if retried:
+            existing = zr_express_service.parcels_by_tracking(await zr_express_service.get_delivery_status(retried))
+            created = [(job, order) for job, order in pending if zr_express_service.tracking_id(order) in existing]
+            for job, order in created:
+                tracking_id = zr_express_service.tracking_id(order)
+                await orderService._set_out_for_delivery(order, tracking_id)
+                operations.append(deliveryOutboxService.completed(job, tracking_id, note="Parcel found from an earlier attempt"))
+            created_ids = {job.id for job, _ in created}
+            pending = [(job, order) for job, order in pending if job.id not in created_ids]
+
+        students = await orderService.get_students([order for _, order in pending])
+        tracking_ids = await zr_delivery_batcher.create_deliveries([
+            (order, students[order.student.to_ref().id])
+            for _, order in pending
+            if order.student.to_ref().id in students
+        ])
+        for job, order in pending:
+            tracking_id = tracking_ids.get(str(order.id))
+            if tracking_id:
+                await orderService._set_out_for_delivery(order, tracking_id)
+                operations.append(deliveryOutboxService.completed(job, tracking_id))
+            elif order.student.to_ref().id not in students:
+                operations.append(deliveryOutboxService.failed(job, "Student not found"))
+            else:
+                operations.append(deliveryOutboxService.failed(job, "ZR Express did not accept the parcel"))
+
+        await deliveryOutboxService.settle(operations)
+        return len(jobs)
 
     @staticmethod
     async def reassign_order_admin(order_id: str, new_admin: User) -> Optional[Order]:
-        order = await Order.get(order_id)
-        if not order:
+        if not ObjectId.is_valid(order_id):
             return None
-        order.assigned_admin = new_admin
-        await order.save()
-        return order
+        return await Order.find_one({"_id": ObjectId(order_id)}).update(
+            {"$set": {"assigned_admin": new_admin.to_ref()}}, response_type=UpdateResponse.NEW_DOCUMENT
+        )
 
     @staticmethod
     async def delete_order(order_id: str) -> bool:
         order = await Order.get(order_id)
         if order:
             await order.delete()
+            await rollupService.record_order_deleted(order)
+            publish_order_event("order.deleted", order)
             return True
         return False
 
@@ -141,15 +590,89 @@ class orderService:
     @staticmethod
     async def get_delivery_status(order_id: str) -> Optional[dict]:
         """
-        Get ZR Express delivery status for an order
+        Cached ZR Express delivery status for an order, as last stored by the poller.
+        An order that was never polled is looked up live; when that finds nothing, an
+        unknown state is stored and served until the poller replaces it, with at most one
+        more live lookup per DELIVERY_LOOKUP_RETRY_SECONDS.
         """
         order = await Order.get(order_id)
         if not order or not order.zr_tracking_id:
             return None
-            
-        try:
-            status_result = await zr_express_service.get_delivery_status([order.zr_tracking_id])
-            return status_result
-        except Exception as e:
-            print(f"Error getting delivery status for order {order_id}: {str(e)}")
-            return None
\ No newline at end of file
+        tracking = order.delivery_tracking
+        now = datetime.utcnow()
+        if tracking is None or (tracking.retry_after is not None and tracking.retry_after <= now):
+            await orderService.refresh_delivery_tracking([order])
+            if order.delivery_tracking is tracking:
+                order.delivery_tracking = DeliveryTracking(
+                    checked_at=now,
+                    retry_after=now + timedelta(seconds=settings.DELIVERY_LOOKUP_RETRY_SECONDS),
+                )
+                # Conditional, so a poller write that landed meanwhile is kept.
+                unchanged = {"delivery_tracking.checked_at": tracking.checked_at} if tracking else {"delivery_tracking": None}
+                await Order.find_one({"_id": order.id, **unchanged}).update(
+                    {"$set": {"delivery_tracking": order.delivery_tracking.model_dump()}}
+                )
+        return {
+            "tracking_id": order.zr_tracking_id,
+            "status": order.status,
+            **order.delivery_tracking.model_dump(),
+        }
+
+    @staticmethod
+    async def refresh_delivery_tracking(orders: Optional[List[Order]] = None, batch_size: int = 100) -> int:
+        """
+        Polls ZR Express for `orders`, by default every order out for delivery, with one /lire
+        request per `batch_size` tracking IDs. Stores each parcel's latest state on its order
+        and moves delivered parcels to DELIVERED. Returns the number of orders delivered.
+        """
+        if orders is None:
+            orders = await Order.find(
+                {"status": OrderStatus.OUT_FOR_DELIVERY.value, "zr_tracking_id": {"$ne": None}}
+            ).to_list()
+        orders = [order for order in orders if order.zr_tracking_id]
+        delivered = 0
+        for i in range(0, len(orders), batch_size):
+            batch = orders[i:i + batch_size]
+            try:
+                status_result = await zr_express_service.get_delivery_status([order.zr_tracking_id for order in batch])
+            except Exception as e:
+                print(f"Error polling delivery status: {str(e)}")
+                continue
+            if status_result is None:
+                continue
+            parcels = zr_express_service.parcels_by_tracking(status_result)
+
+            now = datetime.utcnow()
+            operations = []
+            arrived = []
+            for order in batch:
+                parcel = parcels.get(order.zr_tracking_id)
+                if parcel is None:
+                    continue
+                situation = parcel.get("Situation")
+                previous = order.delivery_tracking
+                order.delivery_tracking = DeliveryTracking(
+                    situation=situation,
+                    parcel=parcel,
+                    updated_at=previous.updated_at if previous and previous.situation == situation else now,
+                    checked_at=now,
+                )
+                operations.append(UpdateOne(
+                    {"_id": order.id},
+                    {"$set": {"delivery_tracking": order.delivery_tracking.model_dump()}},
+                ))
+                if order.status == OrderStatus.OUT_FOR_DELIVERY and zr_express_service.is_delivered(situation):
+                    arrived.append(order)
+            if operations:
+                await Order.get_pymongo_collection().bulk_write(operations, ordered=False)
+
+            for order in arrived:
+                result = await Order.find_one(
+                    {"_id": order.id, "status": OrderStatus.OUT_FOR_DELIVERY.value}
+                ).update({"$set": {"status": OrderStatus.DELIVERED.value}})
+                if result.modified_count:
+                    order.status = OrderStatus.DELIVERED
+                    await rollupService.record_order_transition(order, OrderStatus.OUT_FOR_DELIVERY)
+                    publish_order_event("order.transitioned", order, OrderStatus.OUT_FOR_DELIVERY)
+                    delivered += 1
+        return delivered
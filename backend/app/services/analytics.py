@@ -0,0 +1,505 @@
+import asyncio
+import calendar
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+from bson import ObjectId
+from pymongo import UpdateOne
+from app.cache import TTLCache
+from app.config import settings
+from app.models.analytics import AnalyticsRollup, DashboardAnalytics, MaterialTypePercentage, MonthlyOrder, MonthlyRevenue, OrderStatusPercentage, TimeSeries, TimeSeriesGranularity, TimeSeriesPoint
+from app.models.appointemnt import Appointment
+from app.models.material import Material
+from app.models.order import LEGACY_LINES_EXPR, ORDER_LINES_EXPR, DeliveryType, Order, OrderStatus, order_total
+from app.models.user import User
+
+
+CHART_MATERIAL_TYPES = ["polycopie", "book"]
+
+dashboard_cache = TTLCache(ttl=settings.DASHBOARD_CACHE_TTL_SECONDS)
+
+def order_revenue_expr(material_type: Optional[str] = None) -> dict:
+    """
+    Revenue of one order: its stored total, or the sum of its line totals.
+    With `material_type`, only the lines of that type are counted.
+    """
+    if not material_type:
+        return {"$ifNull": ["$total_dzd", {"$sum": {"$map": {"input": LEGACY_LINES_EXPR, "in": "$$this.line_total_dzd"}}}]}
+    lines = {
+        "$filter": {
+            "input": ORDER_LINES_EXPR,
+            "as": "line",
+            "cond": {"$eq": ["$$line.material_type", material_type]},
+        }
+    }
+    return {"$sum": {"$map": {"input": lines, "in": "$$this.line_total_dzd"}}}
+
+
+ORDER_REVENUE_EXPR = order_revenue_expr()
+
+
+def _percentage(count: int, total: int) -> int:
+    return round((count / total) * 100) if total > 0 else 0
+
+
+def _field(value) -> str:
+    """Counter keys become field names, which cannot contain '.' or start with '$'."""
+    return str(value).replace(".", "_").lstrip("$")
+
+
+REBUILD_MARKER_ID = "rebuild"
+
+
+def _journal():
+    """
+    Increments made while a rollup rebuild runs, plus the marker of that rebuild
+    under REBUILD_MARKER_ID.
+    """
+    return AnalyticsRollup.get_pymongo_collection().database["analytics_rollup_journal"]
+
+
+def _buckets(moment: Optional[datetime]) -> List[tuple]:
+    buckets = [("all", "all", None)]
+    if moment is not None:
+        buckets.append((f"month:{moment:%Y-%m}", "month", datetime(moment.year, moment.month, 1)))
+        buckets.append((f"day:{moment:%Y-%m-%d}", "day", datetime(moment.year, moment.month, moment.day)))
+    return buckets
+
+
+class analyticsService:
+
+    @staticmethod
+    async def order_stats(year: int) -> dict:
+        """
+        Status breakdown of all orders and the monthly order/revenue series of `year`,
+        computed in a single $facet aggregation.
+        """
+        pipeline = [
+            {
+                "$facet": {
+                    "by_status": [
+                        {"$group": {"_id": "$status", "count": {"$sum": 1}}},
+                    ],
+                    "monthly": [
+                        {
+                            "$match": {
+                                "created_at": {
+                                    "$gte": datetime(year, 1, 1),
+                                    "$lt": datetime(year + 1, 1, 1),
+                                }
+                            }
+                        },
+                        {
+                            "$group": {
+                                "_id": {"$month": "$created_at"},
+                                "count": {"$sum": 1},
+                                "revenue": {"$sum": ORDER_REVENUE_EXPR},
+                            }
+                        },
+                        {"$sort": {"_id": 1}},
+                    ],
+                }
+            }
+        ]
+        result = await Order.aggregate(pipeline).to_list()
+        return result[0] if result else {"by_status": [], "monthly": []}
+
+    @staticmethod
+    async def material_type_counts() -> dict:
+        rows = await Material.aggregate(
+            [{"$group": {"_id": "$material_type", "count": {"$sum": 1}}}]
+        ).to_list()
+        return {row["_id"]: row["count"] for row in rows}
+
+    @staticmethod
+    async def count_appointments_on(day: date) -> int:
+        start = datetime.combine(day, time.min)
+        return await Appointment.find(
+            Appointment.scheduled_at >= start,
+            Appointment.scheduled_at < start + timedelta(days=1),
+        ).count()
+
+    @staticmethod
+    def build_dashboard(
+        total_users: int,
+        total_today_appointments: int,
+        status_counts: dict,
+        material_counts: dict,
+        monthly: List[dict],
+    ) -> DashboardAnalytics:
+        """
+        Shapes pre-aggregated counters into the `DashboardAnalytics` response.
+        `monthly` rows carry the month number in `_id`, ascending.
+        """
+        total_orders = sum(status_counts.values())
+        order_status_percentages = [
+            OrderStatusPercentage(
+                status=status.value,
+                percentage=_percentage(status_counts[status.value], total_orders),
+            )
+            for status in OrderStatus
+            if status_counts.get(status.value)
+        ]
+
+        chart_counts = {
+            mat_type: material_counts[mat_type]
+            for mat_type in CHART_MATERIAL_TYPES
+            if material_counts.get(mat_type)
+        }
+        total_materials_for_chart = sum(chart_counts.values())
+        material_type_percentages = [
+            MaterialTypePercentage(
+                material_type=mat_type,
+                percentage=_percentage(count, total_materials_for_chart),
+            )
+            for mat_type, count in chart_counts.items()
+        ]
+
+        monthly_orders = [
+            MonthlyOrder(month=calendar.month_abbr[row["_id"]], count=row["count"])
+            for row in monthly
+        ]
+        monthly_revenue = [
+            MonthlyRevenue(month=calendar.month_abbr[row["_id"]], revenue=row["revenue"])
+            for row in monthly
+        ]
+
+        return DashboardAnalytics(
+            total_users=total_users,
+            total_available_materials=sum(material_counts.values()),
+            total_pending_orders=status_counts.get(OrderStatus.PENDING.value, 0),
+            total_today_appointments=total_today_appointments,
+            order_status_percentages=order_status_percentages,
+            material_type_percentages=material_type_percentages,
+            monthly_orders=monthly_orders,
+            monthly_revenue=monthly_revenue,
+        )
+
+    @staticmethod
+    async def compute_dashboard_analytics() -> DashboardAnalytics:
+        total_users, total_today_appointments, order_stats, material_counts = await asyncio.gather(
+            User.find_all().count(),
+            analyticsService.count_appointments_on(date.today()),
+            analyticsService.order_stats(datetime.now().year),
+            analyticsService.material_type_counts(),
+        )
+        status_counts = {row["_id"]: row["count"] for row in order_stats["by_status"]}
+        return analyticsService.build_dashboard(
+            total_users=total_users,
+            total_today_appointments=total_today_appointments,
+            status_counts=status_counts,
+            material_counts=material_counts,
+            monthly=order_stats["monthly"],
+        )
+
+    @staticmethod
+    async def get_dashboard_analytics() -> DashboardAnalytics:
+        return await dashboard_cache.get(analyticsService.load_dashboard_analytics)
+
+    @staticmethod
+    async def load_dashboard_analytics() -> DashboardAnalytics:
+        """
+        Reads the precomputed rollups, falling back to the aggregations
+        when they have not been built yet. An "all" rollup without `built_at`
+        was only ever incremented, so it misses everything written before it.
+        """
+        year = datetime.now().year
+        totals, months, total_users, total_today_appointments = await asyncio.gather(
+            AnalyticsRollup.get("all"),
+            AnalyticsRollup.find(
+                AnalyticsRollup.period == "month",
+                AnalyticsRollup.start >= datetime(year, 1, 1),
+                AnalyticsRollup.start < datetime(year + 1, 1, 1),
+            ).sort("+start").to_list(),
+            User.find_all().count(),
+            analyticsService.count_appointments_on(date.today()),
+        )
+        if totals is None or totals.built_at is None:
+            return await analyticsService.compute_dashboard_analytics()
+
+        return analyticsService.build_dashboard(
+            total_users=total_users,
+            total_today_appointments=total_today_appointments,
+            status_counts=totals.status,
+            material_counts=totals.materials,
+            monthly=[
+                {"_id": month.start.month, "count": month.orders, "revenue": month.revenue}
+                for month in months
+                if month.orders > 0
+            ],
+        )
+
+    @staticmethod
+    async def order_timeseries(
+        start: datetime,
+        end: datetime,
+        granularity: TimeSeriesGranularity = TimeSeriesGranularity.MONTH,
+        era: Optional[str] = None,
+        material_type: Optional[str] = None,
+        delivery_type: Optional[DeliveryType] = None,
+    ) -> TimeSeries:
+        """
+        Orders and revenue per day, week or month over [start, end).
+        The created_at range is matched first so the scan stays on the index;
+        only non-empty buckets are returned, oldest first.
+        """
+        match: dict = {"created_at": {"$gte": start, "$lt": end}}
+        if era:
+            match["student_era"] = era
+        if delivery_type:
+            match["delivery_type"] = delivery_type.value
+        if material_type:
+            match["$or"] = [
+                {"lines.material_type": material_type},
+                {"item": {"$elemMatch": {"0.material_type": material_type}}},
+            ]
+
+        truncate = {"date": "$created_at", "unit": granularity.value}
+        if granularity == TimeSeriesGranularity.WEEK:
+            truncate["startOfWeek"] = "monday"
+        pipeline = [
+            {"$match": match},
+            {
+                "$group": {
+                    "_id": {"$dateTrunc": truncate},
+                    "orders": {"$sum": 1},
+                    "revenue": {"$sum": order_revenue_expr(material_type)},
+                }
+            },
+            {"$sort": {"_id": 1}},
+        ]
+
+        rows = await Order.aggregate(pipeline).to_list()
+        return TimeSeries(
+            granularity=granularity,
+            start=start,
+            end=end,
+            points=[
+                TimeSeriesPoint(bucket=row["_id"], orders=row["orders"], revenue=row["revenue"])
+                for row in rows
+            ],
+        )
+
+
+class rollupService:
+    """
+    Keeps the `analytics_rollups` counters in step with order and material writes.
+    Orders and materials are bucketed by their `created_at`, so a rebuild
+    reproduces exactly what the incremental updates maintain.
+    """
+
+    @staticmethod
+    async def _increment(moment: Optional[datetime], counters: dict) -> None:
+        await rollupService._increment_many([(moment, counters)])
+
+    @staticmethod
+    async def _increment_many(entries: List[Tuple[Optional[datetime], dict]]) -> None:
+        """
+        Applies several (created_at, counters) increments in one bulk write.
+        While a rebuild runs they are journaled instead, and replayed onto the rebuilt rollups.
+        """
+        merged: Dict[str, dict] = {}
+        buckets: Dict[str, tuple] = {}
+        for moment, counters in entries:
+            for bucket_id, period, start in _buckets(moment):
+                buckets[bucket_id] = (period, start)
+                bucket_counters = merged.setdefault(bucket_id, {})
+                for key, value in counters.items():
+                    bucket_counters[key] = bucket_counters.get(key, 0) + value
+
+        increments = []
+        for bucket_id, counters in merged.items():
+            counters = {key: value for key, value in counters.items() if value}
+            if counters:
+                period, start = buckets[bucket_id]
+                increments.append({"_id": bucket_id, "period": period, "start": start, "inc": counters})
+        if not increments:
+            return
+        try:
+            rebuild_id = await rollupService._running_rebuild()
+            if rebuild_id is None:
+                await rollupService._apply(increments)
+            else:
+                entry = await _journal().insert_one({"rebuild": rebuild_id, "at": datetime.utcnow(), "increments": increments})
+                if await rollupService._running_rebuild() != rebuild_id:
+                    # The rebuild finished meanwhile and may have replayed its journal before this entry landed.
+                    await rollupService._replay({"_id": entry.inserted_id})
+        except Exception as e:
+            print(f"Failed to update analytics rollups: {e}")
+        # Every order and material write lands here, so this is where the dashboard goes stale.
+        # Invalidating after the write keeps a concurrent miss from caching pre-write numbers.
+        dashboard_cache.invalidate()
+
+    @staticmethod
+    async def _apply(increments: List[dict]) -> None:
+        await AnalyticsRollup.get_pymongo_collection().bulk_write([
+            UpdateOne(
+                {"_id": increment["_id"]},
+                {"$inc": increment["inc"], "$setOnInsert": {"period": increment["period"], "start": increment["start"]}},
+                upsert=True,
+            )
+            for increment in increments
+        ], ordered=False)
+
+    @staticmethod
+    async def _replay(query: dict) -> int:
+        """Applies and removes the journal entries matching `query`; each entry is claimed by exactly one caller."""
+        replayed = 0
+        while entry := await _journal().find_one_and_delete(query):
+            await rollupService._apply(entry["increments"])
+            replayed += 1
+        return replayed
+
+    @staticmethod
+    async def _running_rebuild() -> Optional[ObjectId]:
+        """Id of the rebuild in progress, ignoring one that has outlived ANALYTICS_REBUILD_TIMEOUT_SECONDS."""
+        marker = await _journal().find_one({
+            "_id": REBUILD_MARKER_ID,
+            "started_at": {"$gt": datetime.utcnow() - timedelta(seconds=settings.ANALYTICS_REBUILD_TIMEOUT_SECONDS)},
+        })
+        return marker["rebuild"] if marker else None
+
+    @staticmethod
+    async def record_order_created(order: Order) -> None:
+        await rollupService._increment(order.created_at, {
+            "orders": 1,
+            "revenue": order_total(order),
+            f"status.{_field(order.status.value)}": 1,
+        })
+
+    @staticmethod
+    async def record_order_transition(order: Order, previous_status: OrderStatus) -> None:
+        await rollupService.record_order_transitions([(order, previous_status)])
+
+    @staticmethod
+    async def record_order_transitions(transitions: List[Tuple[Order, OrderStatus]]) -> None:
+        await rollupService._increment_many([
+            (order.created_at, {
+                f"status.{_field(previous_status.value)}": -1,
+                f"status.{_field(order.status.value)}": 1,
+            })
+            for order, previous_status in transitions
+            if previous_status != order.status
+        ])
+
+    @staticmethod
+    async def record_order_deleted(order: Order) -> None:
+        await rollupService._increment(order.created_at, {
+            "orders": -1,
+            "revenue": -order_total(order),
+            f"status.{_field(order.status.value)}": -1,
+        })
+
+    @staticmethod
+    async def record_material_created(material: Material) -> None:
+        await rollupService._increment(material.created_at, {
+            f"materials.{_field(material.material_type)}": 1,
+        })
+
+    @staticmethod
+    async def record_material_deleted(material: Material) -> None:
+        await rollupService._increment(material.created_at, {
+            f"materials.{_field(material.material_type)}": -1,
+        })
+
+    @staticmethod
+    async def record_material_retyped(material: Material, previous_type: str) -> None:
+        if previous_type == material.material_type:
+            return
+        await rollupService._increment(material.created_at, {
+            f"materials.{_field(previous_type)}": -1,
+            f"materials.{_field(material.material_type)}": 1,
+        })
+
+    @staticmethod
+    async def ensure_built() -> None:
+        """
+        Rebuilds the rollups unless a rebuild has already run against this database,
+        or when the last one died mid-way and took the increments it journaled with it.
+        """
+        totals = await AnalyticsRollup.get("all")
+        abandoned = await _journal().find_one({
+            "_id": REBUILD_MARKER_ID,
+            "started_at": {"$lte": datetime.utcnow() - timedelta(seconds=settings.ANALYTICS_REBUILD_TIMEOUT_SECONDS)},
+        })
+        if totals is None or totals.built_at is None or abandoned:
+            count = await rollupService.rebuild()
+            print(f"Built {count} analytics rollups")
+
+    @staticmethod
+    async def rebuild() -> int:
+        """
+        Recomputes every rollup from the orders and materials collections into a
+        staging collection, then renames it over the stored rollups in one step.
+        Returns the number of rollup documents.
+
+        From the moment the rebuild starts, increments are journaled instead of applied,
+        since they would be lost with the replaced collection, and replayed once the
+        rebuilt rollups are in place. A write whose increment is journaled although the
+        aggregation already saw it is counted twice; that window is the time between an
+        order or material write and its increment, not the length of the rebuild.
+        """
+        journal = _journal()
+        rebuild_id = ObjectId()
+        started_at = datetime.utcnow()
+        await journal.update_one(
+            {"_id": REBUILD_MARKER_ID},
+            {"$set": {"rebuild": rebuild_id, "started_at": started_at}},
+            upsert=True,
+        )
+
+        day = {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}}
+        order_rows, material_rows = await asyncio.gather(
+            Order.aggregate([
+                {
+                    "$group": {
+                        "_id": {"day": day, "status": "$status"},
+                        "count": {"$sum": 1},
+                        "revenue": {"$sum": ORDER_REVENUE_EXPR},
+                    }
+                }
+            ]).to_list(),
+            Material.aggregate([
+                {
+                    "$group": {
+                        "_id": {"day": day, "material_type": "$material_type"},
+                        "count": {"$sum": 1},
+                    }
+                }
+            ]).to_list(),
+        )
+
+        rollups = {"all": AnalyticsRollup(id="all", period="all", built_at=datetime.utcnow())}
+
+        def rollups_for(row: dict) -> Iterator[AnalyticsRollup]:
+            moment = datetime.strptime(row["_id"]["day"], "%Y-%m-%d") if row["_id"].get("day") else None
+            for bucket_id, period, start in _buckets(moment):
+                if bucket_id not in rollups:
+                    rollups[bucket_id] = AnalyticsRollup(id=bucket_id, period=period, start=start)
+                yield rollups[bucket_id]
+
+        for row in order_rows:
+            status = _field(row["_id"]["status"])
+            for rollup in rollups_for(row):
+                rollup.orders += row["count"]
+                rollup.revenue += row["revenue"]
+                rollup.status[status] = rollup.status.get(status, 0) + row["count"]
+
+        for row in material_rows:
+            material_type = _field(row["_id"]["material_type"])
+            for rollup in rollups_for(row):
+                rollup.materials[material_type] = rollup.materials.get(material_type, 0) + row["count"]
+
+        collection = AnalyticsRollup.get_pymongo_collection()
+        staging = collection.database[f"{collection.name}_staging_{ObjectId()}"]
+        await staging.insert_many([
+            {"_id": rollup.id, **rollup.model_dump(exclude={"id", "revision_id"})}
+            for rollup in rollups.values()
+        ])
+        await staging.rename(collection.name, dropTarget=True)
+
+        await journal.delete_one({"_id": REBUILD_MARKER_ID, "rebuild": rebuild_id})
+        await rollupService._replay({"rebuild": rebuild_id})
+        # Entries left by an abandoned rebuild predate this one's aggregation, which already counts them.
+        await journal.delete_many({"rebuild": {"$ne": rebuild_id}, "at": {"$lt": started_at}})
+        dashboard_cache.invalidate()
+        return len(rollups)
@@ -2,10 +2,11 @@ from app.models.appointemnt import Appointment
 from datetime import datetime
 from typing import List, Optional
 from app.models.user import User
-from app.models.order import Order
-from beanie import Link, PydanticObjectId
+from app.models.order import Order, OrderLine
+from beanie import PydanticObjectId
 from app.services.notifction import notificationService
-from app.models.material import Material
+from app.services.analytics import dashboard_cache
+from app.pagination import KEYSET_SORT, after_cursor
 
 
 class appointemntService:
@@ -23,15 +24,19 @@ class appointemntService:
             location=location,
             created_at= datetime.utcnow()
         )
-        item = await  appointemntService.stringify_order_items(order.item)
+        item = appointemntService.stringify_order_lines(order.lines)
         notif = await notificationService.create_notification(user=student, message=f'vous avez un rendez-vous, le {scheduled_at} pour {item}')
         await notif.insert()
         await appointement.insert()
+        dashboard_cache.invalidate()
         return appointement
 
     @staticmethod
-    async def get_all_appointement(skip: Optional[int] = 0, limit: Optional[int] = 10) -> List[Appointment]:
-        return await Appointment.find().skip(skip).limit(limit).to_list()
+    async def get_all_appointement(skip: Optional[int] = 0, limit: Optional[int] = 10, cursor: Optional[str] = None) -> List[Appointment]:
+        appointements = Appointment.find(after_cursor(cursor)).sort(KEYSET_SORT)
+        if not cursor:
+            appointements = appointements.skip(skip)
+        return await appointements.limit(limit).to_list()
 
     @staticmethod
     async def update_appointement(appointement_id: str, data: dict) -> Optional[Appointment]:
@@ -41,6 +46,7 @@ class appointemntService:
         for key, value in data.items():
             setattr(appointement, key, value)
         await appointement.save()
+        dashboard_cache.invalidate()
         return appointement
 
     @staticmethod
@@ -48,6 +54,7 @@ class appointemntService:
         appointement = await Appointment.get(appointement_id)
         if appointement:
             await appointement.delete()
+            dashboard_cache.invalidate()
             return True
         return False
 
@@ -68,9 +75,5 @@ class appointemntService:
         return await Appointment.find(Appointment.location == location).to_list()
     
     @staticmethod
-    async def stringify_order_items(items: List[tuple[Link["Material"], int]]) -> str:
-       parts = []
-       for material_link, qty in items:
-          material =  material_link
-          parts.append(f"{qty}x {material.title}")
-       return ", ".join(parts)    
\ No newline at end of file
+    def stringify_order_lines(lines: List[OrderLine]) -> str:
+       return ", ".join(f"{line.quantity}x {line.title}" for line in lines)    
\ No newline at end of file
@@ -0,0 +1,199 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import List, Optional
+from beanie import PydanticObjectId
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from app.config import settings
+from app.models.delivery_job import DeliveryJob, DeliveryJobStatus, DeliveryOutboxStats
+
+
+# Set when jobs are enqueued so the worker does not wait for its next poll.
+jobs_enqueued = asyncio.Event()
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Exponential backoff after the `attempts`-th failed attempt, capped."""
+    delay = settings.DELIVERY_OUTBOX_BACKOFF_BASE_SECONDS * 2 ** max(attempts - 1, 0)
+    return timedelta(seconds=min(delay, settings.DELIVERY_OUTBOX_BACKOFF_MAX_SECONDS))
+
+
+class deliveryOutboxService:
+    """
+    Mongo-backed outbox of ZR Express delivery creations. Jobs are claimed with a lease,
+    so a worker that dies mid-batch only delays its jobs until the lease expires.
+    """
+
+    @staticmethod
+    async def enqueue(order_ids: List[PydanticObjectId]) -> None:
+        if not order_ids:
+            return
+        now = datetime.utcnow()
+        await DeliveryJob.get_pymongo_collection().bulk_write([
+            UpdateOne(
+                {"order_id": order_id},
+                {"$setOnInsert": {
+                    "order_id": order_id,
+                    "status": DeliveryJobStatus.PENDING.value,
+                    "attempts": 0,
+                    "next_attempt_at": now,
+                    "locked_until": None,
+                    "last_error": None,
+                    "tracking_id": None,
+                    "created_at": now,
+                    "completed_at": None,
+                }},
+                upsert=True,
+            )
+            for order_id in order_ids
+        ], ordered=False)
+        jobs_enqueued.set()
+
+    @staticmethod
+    async def wait_for_jobs(timeout: float) -> None:
+        try:
+            await asyncio.wait_for(jobs_enqueued.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        jobs_enqueued.clear()
+
+    @staticmethod
+    async def claim(limit: int) -> List[DeliveryJob]:
+        """
+        Leases up to `limit` due jobs, oldest first, counting the attempt. A job whose lease
+        expired on its last attempt is dead-lettered instead of being claimed again.
+        """
+        now = datetime.utcnow()
+        expired = await DeliveryJob.get_pymongo_collection().update_many(
+            {
+                "status": DeliveryJobStatus.PROCESSING.value,
+                "locked_until": {"$lt": now},
+                "attempts": {"$gte": settings.DELIVERY_OUTBOX_MAX_ATTEMPTS},
+            },
+            {"$set": {
+                "status": DeliveryJobStatus.DEAD.value,
+                "last_error": "Lease expired on the last attempt",
+                "locked_until": None,
+            }},
+        )
+        if expired.modified_count:
+            print(f"{expired.modified_count} delivery jobs dead after their lease expired on the last attempt")
+        jobs = []
+        for _ in range(limit):
+            doc = await DeliveryJob.get_pymongo_collection().find_one_and_update(
+                {
+                    "$or": [
+                        {"status": DeliveryJobStatus.PENDING.value, "next_attempt_at": {"$lte": now}},
+                        {
+                            "status": DeliveryJobStatus.PROCESSING.value,
+                            "locked_until": {"$lt": now},
+                            "attempts": {"$lt": settings.DELIVERY_OUTBOX_MAX_ATTEMPTS},
+                        },
+                    ]
+                },
+                {
+                    "$set": {
+                        "status": DeliveryJobStatus.PROCESSING.value,
+                        "locked_until": now + timedelta(seconds=settings.DELIVERY_OUTBOX_LEASE_SECONDS),
+                    },
+                    "$inc": {"attempts": 1},
+                },
+                sort=[("next_attempt_at", 1)],
+                return_document=ReturnDocument.AFTER,
+            )
+            if doc is None:
+                break
+            jobs.append(DeliveryJob.model_validate(doc))
+        return jobs
+
+    @staticmethod
+    def completed(job: DeliveryJob, tracking_id: Optional[str], note: Optional[str] = None) -> UpdateOne:
+        return UpdateOne(
+            {"_id": job.id, "status": DeliveryJobStatus.PROCESSING.value},
+            {"$set": {
+                "status": DeliveryJobStatus.DONE.value,
+                "tracking_id": tracking_id,
+                "last_error": note,
+                "locked_until": None,
+                "completed_at": datetime.utcnow(),
+            }},
+        )
+
+    @staticmethod
+    def failed(job: DeliveryJob, error: str) -> UpdateOne:
+        if job.attempts >= settings.DELIVERY_OUTBOX_MAX_ATTEMPTS:
+            print(f"Delivery job for order {job.order_id} dead after {job.attempts} attempts: {error}")
+            changes = {"status": DeliveryJobStatus.DEAD.value}
+        else:
+            changes = {
+                "status": DeliveryJobStatus.PENDING.value,
+                "next_attempt_at": datetime.utcnow() + retry_delay(job.attempts),
+            }
+        return UpdateOne(
+            {"_id": job.id, "status": DeliveryJobStatus.PROCESSING.value},
+            {"$set": {**changes, "last_error": error, "locked_until": None}},
+        )
+
+    @staticmethod
+    async def settle(operations: List[UpdateOne]) -> None:
+        if operations:
+            await DeliveryJob.get_pymongo_collection().bulk_write(operations, ordered=False)
+
+    @staticmethod
+    async def requeue(job_id: str) -> bool:
+        """Gives a dead job a fresh set of attempts."""
+        if not ObjectId.is_valid(job_id):
+            return False
+        result = await DeliveryJob.get_pymongo_collection().update_one(
+            {"_id": ObjectId(job_id), "status": DeliveryJobStatus.DEAD.value},
+            {"$set": {
+                "status": DeliveryJobStatus.PENDING.value,
+                "attempts": 0,
+                "next_attempt_at": datetime.utcnow(),
+            }},
+        )
+        if result.modified_count:
+            jobs_enqueued.set()
+        return bool(result.modified_count)
+
+    @staticmethod
+    async def get_dead_jobs(skip: int = 0, limit: int = 50) -> List[DeliveryJob]:
+        return await DeliveryJob.find(
+            {"status": DeliveryJobStatus.DEAD.value}
+        ).sort("-next_attempt_at").skip(skip).limit(limit).to_list()
+
+    @staticmethod
+    async def stats() -> DeliveryOutboxStats:
+        now = datetime.utcnow()
+        result = await DeliveryJob.aggregate([
+            {
+                "$facet": {
+                    "counts": [{"$group": {"_id": "$status", "count": {"$sum": 1}}}],
+                    "oldest_pending": [
+                        {"$match": {"status": {"$in": [DeliveryJobStatus.PENDING.value, DeliveryJobStatus.PROCESSING.value]}}},
+                        {"$group": {"_id": None, "created_at": {"$min": "$created_at"}}},
+                    ],
+                    "latency": [
+                        {"$match": {
+                            "status": DeliveryJobStatus.DONE.value,
+                            "completed_at": {"$gte": now - timedelta(hours=1)},
+                            "tracking_id": {"$ne": None},
+                        }},
+                        {"$group": {"_id": None, "ms": {"$avg": {"$subtract": ["$completed_at", "$created_at"]}}}},
+                    ],
+                }
+            }
+        ]).to_list()
+        facets = result[0] if result else {"counts": [], "oldest_pending": [], "latency": []}
+
+        counts = {status: 0 for status in DeliveryJobStatus}
+        for row in facets["counts"]:
+            counts[DeliveryJobStatus(row["_id"])] = row["count"]
+        oldest = facets["oldest_pending"][0]["created_at"] if facets["oldest_pending"] else None
+        latency = facets["latency"][0]["ms"] if facets["latency"] else None
+        return DeliveryOutboxStats(
+            counts=counts,
+            queue_depth=counts[DeliveryJobStatus.PENDING] + counts[DeliveryJobStatus.PROCESSING],
+            oldest_pending_seconds=(now - oldest).total_seconds() if oldest else None,
+            average_latency_seconds=latency / 1000 if latency is not None else None,
+        )
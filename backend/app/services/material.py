@@ -1,8 +1,59 @@
-from app.models.material import Material, materialUser
-from typing import List, Optional
+from app.catalog import material_catalog
+from app.models.material import Material, MaterialFacets, materialUser
+from app.services.analytics import rollupService
+from app.pagination import KEYSET_SORT, after_cursor, page_limit
+from beanie.odm.utils.projection import get_projection
+from typing import List, Optional, Tuple, Type
+from pydantic import BaseModel
 from datetime import datetime
 
 
+def text_match(keyword: str) -> dict:
+    """
+    $text filter for the material text index. The keyword is searched as plain words,
+    never interpreted as a pattern, so user input cannot build a regex.
+    """
+    return {"$text": {"$search": keyword}}
+
+
+def material_filter(
+    title: Optional[str] = None,
+    material_type: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    date: Optional[datetime] = None,
+    subject: Optional[str] = None,
+    annee: Optional[str] = None,
+    specialite: Optional[str] = None,
+) -> dict:
+    query = {}
+
+    if title:
+        query.update(text_match(title))
+
+    if material_type:
+        query["material_type"] = material_type
+
+    if min_price is not None or max_price is not None:
+        query["price_dzd"] = {}
+        if min_price is not None:
+            query["price_dzd"]["$gte"] = min_price
+        if max_price is not None:
+            query["price_dzd"]["$lte"] = max_price
+    if subject:
+        query["module"] = subject
+    if annee:
+        query["study_year"] = annee
+    if specialite:
+        query["specialite"] = specialite
+    if date:
+        query["created_at"] = date
+    return query
+
+
+FACET_FIELDS = ("material_type", "study_year", "specialite", "module")
+
+
 class materialService:
     
     @staticmethod
@@ -16,9 +67,27 @@ class materialService:
         specialite: Optional[str] = None,
         date: Optional[datetime] = None,
         skip: int = 0,
-        limit: int = 10
+        limit: int = 10,
+        cursor: Optional[str] = None,
     ) -> List[materialUser]:
-        materials = await materialService.filter_materials_admin(
+        """
+        Served from the in-memory catalog; title searches still go through the text index.
+        """
+        if not title:
+            catalog = await material_catalog.snapshot()
+            return catalog.filter(
+                material_type=material_type,
+                min_price=min_price,
+                max_price=max_price,
+                subject=subject,
+                annee=annee,
+                specialite=specialite,
+                date=date,
+                skip=skip,
+                limit=limit,
+                cursor=cursor,
+            )
+        return await materialService.filter_materials_admin(
             title=title,
             material_type=material_type,
             min_price=min_price,
@@ -28,9 +97,10 @@ class materialService:
             specialite=specialite,
             date=date,
             skip=skip,
-            limit=limit
+            limit=limit,
+            cursor=cursor,
+            projection_model=materialUser,
         )
-        return [materialUser(**m.model_dump()) for m in materials]
     
     
     @staticmethod
@@ -44,36 +114,81 @@ class materialService:
         annee: Optional[str] = None,
         specialite: Optional[str] = None,
         skip: int = 0,
-        limit: int = 10
-    ) -> List[Material]:
-        query = {}
+        limit: int = 10,
+        cursor: Optional[str] = None,
+        projection_model: Type[BaseModel] = Material,
+    ) -> list:
+        """
+        With a `cursor` the page starts right after it (keyset pagination)
+        and `skip` is ignored. Any other `projection_model` only fetches its fields.
+        With a `title`, matches come most relevant first, as in search_materials; relevance
+        has no keyset, so those pages use `skip` and ignore `cursor`.
+        """
+        query = material_filter(title, material_type, min_price, max_price, date, subject, annee, specialite)
+        if title:
+            pipeline = [
+                {"$match": query},
+                {"$sort": {"score": {"$meta": "textScore"}, "_id": 1}},
+                {"$skip": skip},
+                {"$limit": limit},
+            ]
+            if projection_model is not Material:
+                pipeline.append({"$project": get_projection(projection_model)})
+            return await Material.aggregate(pipeline, projection_model=projection_model).to_list()
 
+        query.update(after_cursor(cursor))
+        materials = Material.find(query, projection_model=projection_model).sort(KEYSET_SORT)
+        if not cursor:
+            materials = materials.skip(skip)
+        return await materials.limit(limit).to_list()
+    @staticmethod
+    async def facet_materials(
+        title: Optional[str] = None,
+        material_type: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        date: Optional[datetime] = None,
+        subject: Optional[str] = None,
+        annee: Optional[str] = None,
+        specialite: Optional[str] = None,
+        skip: int = 0,
+        limit: int = 10,
+        cursor: Optional[str] = None,
+    ) -> MaterialFacets:
+        """
+        One page of the filter_materials_admin results plus, in the same $facet aggregation,
+        the total and the count per value of each FACET_FIELDS field over all matches.
+        The cursor only moves the page; the counts always cover the whole filter.
+        """
+        if title:
+            page = [{"$sort": {"text_score": -1, "_id": 1}}, {"$skip": skip}]
+        elif cursor:
+            page = [{"$match": after_cursor(cursor)}, {"$sort": dict(KEYSET_SORT)}]
+        else:
+            page = [{"$sort": dict(KEYSET_SORT)}, {"$skip": skip}]
+        page += [{"$limit": limit}, {"$project": get_projection(materialUser)}]
+
+        facets = {"items": page, "total": [{"$count": "count"}]}
+        for field in FACET_FIELDS:
+            facets[field] = [
+                {"$sortByCount": f"${field}"},
+                {"$project": {"_id": 0, "value": "$_id", "count": 1}},
+            ]
+        query = material_filter(title, material_type, min_price, max_price, date, subject, annee, specialite)
+        pipeline = [{"$match": query}, {"$facet": facets}]
         if title:
-            query["title"] = {"$regex": f".*{title}.*", "$options": "i"}
-
-        if material_type:
-            query["material_type"] = material_type
-
-        if min_price is not None or max_price is not None:
-            query["price_dzd"] = {}
-            if min_price is not None:
-                query["price_dzd"]["$gte"] = min_price
-            if max_price is not None:
-                query["price_dzd"]["$lte"] = max_price
-        if subject:
-            query["module"] = subject
-        if annee:
-            query["study_year"] = annee
-        if specialite:
-            query["specialite"] = specialite
-        if date:
-            query["created_at"] = date
-
-        return await Material.find(query).sort("-created_at").skip(skip).limit(limit).to_list()
-    @staticmethod
-    async def get_all_material_user(skip: int = 0, limit: int = 10) -> List[materialUser]:
-        material= await Material.find_all().sort("-created_at").to_list()
-        return [materialUser(**m.model_dump()) for m in material]
+            pipeline.insert(1, {"$set": {"text_score": {"$meta": "textScore"}}})
+        result = await Material.aggregate(pipeline).to_list()
+
+        row = result[0]
+        row["total"] = row["total"][0]["count"] if row["total"] else 0
+        return MaterialFacets.model_validate(row)
+
+    @staticmethod
+    async def get_all_material_user(skip: int = 0, limit: int = 10) -> Tuple[List[materialUser], int]:
+        """A page of the catalog snapshot and the snapshot's size, so both agree."""
+        catalog = await material_catalog.snapshot()
+        return catalog.materials[skip:skip + page_limit(limit)], len(catalog.materials)
         
 
     @staticmethod
@@ -105,30 +220,35 @@ class materialService:
             module=module,
         )
         await material.insert()
+        await rollupService.record_material_created(material)
+        await material_catalog.bump()
         return material
 
     @staticmethod
     async def get_all_materials( skip: int = 0, limit: int = 10) -> List[Material]:
-        return await Material.find_all().sort("-created_at").to_list()
+        return await Material.find_all().sort(KEYSET_SORT).skip(skip).limit(page_limit(limit)).to_list()
     
     @staticmethod
     async def get_materiel_for_user(skip: int = 0, limit: int = 10) -> List[materialUser]:
-       materials = await Material.find_all().sort("-created_at").to_list()
-       return [materialUser(**m.model_dump()) for m in materials]
-   
+       return await Material.find_all(projection_model=materialUser).sort(KEYSET_SORT).skip(skip).limit(page_limit(limit)).to_list()
+
     @staticmethod
-    async def get_all_materials_by_type(material_type: str) -> List[Material]:
-        return await Material.find(Material.material_type == material_type).to_list()
-    
+    async def count_materials() -> int:
+        """Catalog size for the total-count header; a count_documents call, not a page read."""
+        return await Material.find_all().count()
+   
 
     @staticmethod
     async def update_material(material_id: str, data: dict) -> Optional[Material]:
         material = await Material.get(material_id)
         if not material:
             return None
+        previous_type = material.material_type
         for key, value in data.items():
             setattr(material, key, value)
         await material.save()
+        await rollupService.record_material_retyped(material, previous_type)
+        await material_catalog.bump()
         return material
 
     @staticmethod
@@ -136,27 +256,38 @@ class materialService:
         material = await Material.get(material_id)
         if material:
             await material.delete()
+            await rollupService.record_material_deleted(material)
+            await material_catalog.bump()
             return True
         return False
 
     @staticmethod
-    async def search_materials_by_title(keyword: str) -> List[materialUser]:
-        material= await Material.find(Material.title.regex(f".*{keyword}.*", "i")).to_list()
-        return [materialUser(**m.model_dump()) for m in material]
-    
-    @staticmethod
-    async def search_material_admin(keyword: str) -> List[Material]:
-        return await Material.find(Material.title.regex(f".*{keyword}.*", "i")).to_list()
+    async def search_materials(keyword: str, limit: int = 50, projection_model: Type[BaseModel] = Material) -> list:
+        """
+        Materials matching `keyword` in title, module, specialite or description,
+        most relevant first, served by the french text index.
+        """
+        pipeline = [
+            {"$match": text_match(keyword)},
+            {"$sort": {"score": {"$meta": "textScore"}, "_id": 1}},
+            {"$limit": limit},
+        ]
+        if projection_model is not Material:
+            pipeline.append({"$project": get_projection(projection_model)})
+        return await Material.aggregate(pipeline, projection_model=projection_model).to_list()
 
     @staticmethod
-    async def get_materials_by_type_admin(material_type: str) -> List[Material]:
-        return await Material.find(Material.material_type == material_type).to_list()
+    async def search_materials_by_title(keyword: str, limit: int = 50) -> List[materialUser]:
+        return await materialService.search_materials(keyword, limit, projection_model=materialUser)
     
     @staticmethod
-    async def get_materials_user(material_type: str) -> List[materialUser]:
-        material= await Material.find(Material.material_type == material_type).to_list()
-        return [materialUser(**m.model_dump()) for m in material]
+    async def search_material_admin(keyword: str, limit: int = 50) -> List[Material]:
+        return await materialService.search_materials(keyword, limit)
 
     @staticmethod
-    async def get_materials_by_date(date: datetime) -> List[Material]:
-        return await Material.find(Material.created_at == date).to_list()
\ No newline at end of file
+    async def get_materials_by_type_admin(material_type: str, skip: int = 0, limit: int = 10) -> List[Material]:
+        return await Material.find(Material.material_type == material_type).sort(KEYSET_SORT).skip(skip).limit(page_limit(limit)).to_list()
+    
+    @staticmethod
+    async def get_materials_by_date(date: datetime, skip: int = 0, limit: int = 10) -> List[Material]:
+        return await Material.find(Material.created_at == date).sort(KEYSET_SORT).skip(skip).limit(page_limit(limit)).to_list()
\ No newline at end of file
@@ -1,5 +1,8 @@
+from typing import List, Optional
 from app.models.user import User
 from bson import ObjectId
+from app.services.analytics import dashboard_cache
+from app.pagination import KEYSET_SORT, after_cursor
 
 
 class UserService :
@@ -9,5 +12,21 @@ class UserService :
     @staticmethod
     async def get_user_by_id(id:str):
         return await User.find_one({"_id": ObjectId(id)})
-    
-    
\ No newline at end of file
+
+    @staticmethod
+    async def get_users(skip: int = 0, limit: int = 10, cursor: Optional[str] = None) -> List[User]:
+        users = User.find(after_cursor(cursor)).sort(KEYSET_SORT)
+        if not cursor:
+            users = users.skip(skip)
+        return await users.limit(limit).to_list()
+
+    @staticmethod
+    async def insert_user(user: User) -> User:
+        await user.insert()
+        dashboard_cache.invalidate()
+        return user
+
+    @staticmethod
+    async def delete_user(user: User) -> None:
+        await user.delete()
+        dashboard_cache.invalidate()
@@ -1,80 +1,212 @@
+import asyncio
+import time
+import unicodedata
 import httpx
 import json
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 from fastapi import HTTPException
-from app.models.order import Order
+from app.models.order import Order, order_total
 from app.models.user import User
-import os
-from datetime import datetime
+from app.config import settings
+from app.circuit_breaker import CircuitBreaker, CircuitOpenError, CircuitState
+from app.metrics import LATENCY_BUCKETS, registry
+
+
+zr_request_seconds = registry.histogram(
+    "zr_express_request_duration_seconds", "ZR Express call latency by operation and outcome", LATENCY_BUCKETS
+)
+zr_requests = registry.counter(
+    "zr_express_requests_total", "ZR Express calls by operation and outcome (success, failure, error, rejected)"
+)
+zr_circuit_state = registry.gauge(
+    "zr_express_circuit_state", "ZR Express circuit breaker state: 0 closed, 1 half-open, 2 open"
+)
+CIRCUIT_STATE_VALUES = {CircuitState.CLOSED: 0, CircuitState.HALF_OPEN: 1, CircuitState.OPEN: 2}
+zr_circuit_state.set(0)
+
+
+def situation_key(situation: str) -> str:
+    """Situation compared without case, accents or repeated spaces."""
+    decomposed = unicodedata.normalize("NFKD", situation)
+    return " ".join("".join(c for c in decomposed if not unicodedata.combining(c)).lower().split())
+
+
+def _situations(setting: str) -> set:
+    return {situation_key(value) for value in setting.split(",") if value.strip()}
+
+
+# /lire situations from the point the parcel reached the student (delivered, then cash collected and paid out).
+DELIVERED_SITUATIONS = _situations(settings.ZR_EXPRESS_DELIVERED_SITUATIONS)
+KNOWN_SITUATIONS = DELIVERED_SITUATIONS | _situations(settings.ZR_EXPRESS_KNOWN_SITUATIONS)
+_unrecognised_situations: set = set()
+
+# MessageRetour of a parcel add_colis accepted, lowercased; anything else is a rejection.
+ADD_COLIS_ACCEPTED = "good"
 
 
 class ZRExpressService:
     def __init__(self):
-        self.base_url = "https://procolis.com/api_v1"
-        self.token = os.getenv("ZR_EXPRESS_TOKEN")
-        self.api_key = os.getenv("ZR_EXPRESS_KEY")
+        self.base_url = settings.ZR_EXPRESS_BASE_URL
+        self.token = settings.ZR_EXPRESS_TOKEN
+        self.api_key = settings.ZR_EXPRESS_KEY
         
         self.headers = {
             "Content-Type": "application/json",
             "token": self.token,
             "key": self.api_key
         }
+        self._client: Optional[httpx.AsyncClient] = None
+        self.breaker = CircuitBreaker(
+            "ZR Express",
+            failure_rate=settings.ZR_EXPRESS_BREAKER_FAILURE_RATE,
+            minimum_calls=settings.ZR_EXPRESS_BREAKER_MINIMUM_CALLS,
+            window=settings.ZR_EXPRESS_BREAKER_WINDOW,
+            open_seconds=settings.ZR_EXPRESS_BREAKER_OPEN_SECONDS,
+            half_open_calls=settings.ZR_EXPRESS_BREAKER_HALF_OPEN_CALLS,
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """
+        The pooled client shared by every call, so connections and TLS sessions are reused.
+        Opened by the app lifespan; created on first use elsewhere (e.g. maintenance commands).
+        """
+        if self._client is None or self._client.is_closed:
+            self.start()
+        return self._client
+
+    def start(self) -> None:
+        """Opens the pooled client; called from the app lifespan."""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=self.headers,
+                limits=httpx.Limits(
+                    max_connections=settings.ZR_EXPRESS_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.ZR_EXPRESS_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=settings.ZR_EXPRESS_KEEPALIVE_EXPIRY_SECONDS,
+                ),
+                timeout=self._timeout(settings.ZR_EXPRESS_READ_TIMEOUT_SECONDS),
+            )
+
+    def _timeout(self, read: float) -> httpx.Timeout:
+        return httpx.Timeout(read, connect=settings.ZR_EXPRESS_CONNECT_TIMEOUT_SECONDS)
+
+    async def _post(self, operation: str, path: str, payload: Dict[str, Any], read_timeout: float) -> httpx.Response:
+        """
+        POSTs through the circuit breaker, recording latency and outcome per operation.
+        Raises CircuitOpenError without calling ZR Express while the circuit is open.
+        """
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError:
+            zr_requests.inc(operation=operation, outcome="rejected")
+            raise
+        started = time.perf_counter()
+        try:
+            response = await self.client.post(path, json=payload, timeout=self._timeout(read_timeout))
+        except Exception:
+            self._record(operation, "error", started)
+            raise
+        except BaseException:
+            # Cancelled mid-call: nothing to record, but a half-open probe slot must not leak.
+            self.breaker.release()
+            raise
+        failed = response.status_code >= 500 or response.status_code == 429
+        self._record(operation, "failure" if failed else "success", started)
+        return response
+
+    def _record(self, operation: str, outcome: str, started: float) -> None:
+        zr_request_seconds.observe(time.perf_counter() - started, operation=operation, outcome=outcome)
+        zr_requests.inc(operation=operation, outcome=outcome)
+        if outcome == "success":
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+        zr_circuit_state.set(CIRCUIT_STATE_VALUES[self.breaker.state])
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @staticmethod
+    def tracking_id(order: Order) -> str:
+        """
+        The same for every attempt at an order's parcel, so a retried add_colis can be
+        recognised instead of creating a second parcel.
+        """
+        return f"ORDER_{order.id}"
+
+    def _colis(self, order: Order, user: User) -> Dict[str, Any]:
+        total_amount = order_total(order)
+        return {
+            "Tracking": self.tracking_id(order),
+            "TypeLivraison": "0", 
+            "TypeColis": "0", 
+            "Confirmee": "", 
+            "Client": user.full_name or "Client",
+            "MobileA": order.delivery_phone or user.phone_number or "0000000000",
+            "MobileB": "0000000000",
+            "Adresse": order.delivery_address or "Adresse non fournie",
+            "IDWilaya": "31",  
+            "Commune": user.era,  
+            "Total": str(int(total_amount)),
+            "Note": f"Commande Lectio #{order.id}",
+            "TProduit": "Matériel d'impression",
+            "id_Externe": str(order.id),
+            "Source": ""
+        }
 
     async def create_delivery(self, order: Order, user: User) -> Optional[str]:
         """
         Creates a delivery request with ZR Express
         Returns tracking ID if successful, None otherwise
         """
+        tracking_ids = await self.create_deliveries([(order, user)])
+        return tracking_ids.get(str(order.id))
+
+    async def create_deliveries(self, orders: List[Tuple[Order, User]]) -> Dict[str, str]:
+        """
+        Creates the deliveries of several orders in a single add_colis request
+        Returns tracking IDs keyed by order ID, empty if the request failed
+        """
+        if not orders:
+            return {}
         try:
-            
-            total_amount = sum(
-                material.price_dzd * qty 
-                for material, qty in order.item
-            )
-            
-            
-            delivery_data = {
-                "Colis": [
-                    {
-                        "Tracking": f"ORDER_{order.id}_{datetime.now().strftime('%Y%m%d%H%M')}",
-                        "TypeLivraison": "0", 
-                        "TypeColis": "0", 
-                        "Confirmee": "", 
-                        "Client": user.full_name or "Client",
-                        "MobileA": order.delivery_phone or user.phone or "0000000000",
-                        "MobileB": "0000000000",
-                        "Adresse": order.delivery_address or "Adresse non fournie",
-                        "IDWilaya": "31",  
-                        "Commune": user.era,  
-                        "Total": str(int(total_amount)),
-                        "Note": f"Commande Lectio #{order.id}",
-                        "TProduit": "Matériel d'impression",
-                        "id_Externe": str(order.id),
-                        "Source": ""
-                    }
-                ]
-            }
+            colis = [self._colis(order, user) for order, user in orders]
+            delivery_data = {"Colis": colis}
 
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/add_colis",
-                    headers=self.headers,
-                    json=delivery_data,
-                    timeout=30.0
-                )
+            response = await self._post("create", "/add_colis", delivery_data, settings.ZR_EXPRESS_CREATE_TIMEOUT_SECONDS)
+            
+            if response.status_code == 200:
+                return self.accepted_parcels(response.json(), {parcel["Tracking"]: parcel["id_Externe"] for parcel in colis})
+            else:
+                print(f"ZR Express API Error: {response.status_code} - {response.text}")
+                return {}
                 
-                if response.status_code == 200:
-                    result = response.json()
-                    # Extract tracking ID from response
-                    tracking_id = delivery_data["Colis"][0]["Tracking"]
-                    return tracking_id
-                else:
-                    print(f"ZR Express API Error: {response.status_code} - {response.text}")
-                    return None
-                    
         except Exception as e:
             print(f"Error creating delivery: {str(e)}")
-            return None
+            return {}
+
+    @staticmethod
+    def accepted_parcels(result: Any, order_ids: Dict[str, str]) -> Dict[str, str]:
+        """
+        Tracking IDs keyed by order ID for the parcels of an add_colis response whose
+        MessageRetour reports success. `order_ids` maps each submitted tracking ID to its
+        order; rejected or unanswered parcels are logged and left out.
+        """
+        parcels = ZRExpressService.parcels_by_tracking(result)
+        accepted = {}
+        for tracking_id, order_id in order_ids.items():
+            parcel = parcels.get(tracking_id)
+            if parcel is None:
+                print(f"ZR Express did not answer for parcel {tracking_id}")
+            elif str(parcel.get("MessageRetour", "")).strip().lower() != ADD_COLIS_ACCEPTED:
+                print(f"ZR Express rejected parcel {tracking_id}: {parcel.get('MessageRetour')}")
+            else:
+                accepted[order_id] = tracking_id
+        return accepted
 
     async def get_delivery_status(self, tracking_ids: list) -> Optional[Dict[str, Any]]:
         """
@@ -85,24 +217,38 @@ class ZRExpressService:
                 "Colis": [{"Tracking": tracking_id} for tracking_id in tracking_ids]
             }
 
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/lire",
-                    headers=self.headers,
-                    json=status_data,
-                    timeout=30.0
-                )
+            response = await self._post("read", "/lire", status_data, settings.ZR_EXPRESS_READ_TIMEOUT_SECONDS)
+            
+            if response.status_code == 200:
+                return response.json()
+            else:
+                print(f"ZR Express Status API Error: {response.status_code} - {response.text}")
+                return None
                 
-                if response.status_code == 200:
-                    return response.json()
-                else:
-                    print(f"ZR Express Status API Error: {response.status_code} - {response.text}")
-                    return None
-                    
         except Exception as e:
             print(f"Error getting delivery status: {str(e)}")
             return None
 
+    @staticmethod
+    def parcels_by_tracking(status_result: Any) -> Dict[str, Dict[str, Any]]:
+        """Parcels of a /lire response keyed by tracking ID"""
+        parcels = status_result.get("Colis", []) if isinstance(status_result, dict) else status_result or []
+        return {
+            parcel["Tracking"]: parcel
+            for parcel in parcels
+            if isinstance(parcel, dict) and parcel.get("Tracking")
+        }
+
+    @staticmethod
+    def is_delivered(situation: Optional[str]) -> bool:
+        if not situation:
+            return False
+        key = situation_key(situation)
+        if key not in KNOWN_SITUATIONS and key not in _unrecognised_situations:
+            _unrecognised_situations.add(key)
+            print(f"Unrecognised ZR Express situation {situation!r}; add it to ZR_EXPRESS_DELIVERED_SITUATIONS or ZR_EXPRESS_KNOWN_SITUATIONS")
+        return key in DELIVERED_SITUATIONS
+
     async def update_delivery_status(self, tracking_ids: list, new_status: str) -> bool:
         """
         Update delivery status (change to ready for pickup, etc.)
@@ -112,19 +258,93 @@ class ZRExpressService:
                 "Colis": [{"Tracking": tracking_id} for tracking_id in tracking_ids]
             }
 
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/pret",
-                    headers=self.headers,
-                    json=update_data,
-                    timeout=30.0
-                )
+            response = await self._post("update", "/pret", update_data, settings.ZR_EXPRESS_UPDATE_TIMEOUT_SECONDS)
+            
+            return response.status_code == 200
                 
-                return response.status_code == 200
-                    
         except Exception as e:
             print(f"Error updating delivery status: {str(e)}")
             return False
 
 
-zr_express_service = ZRExpressService()
\ No newline at end of file
+class DeliveryBatcher:
+    """
+    Coalesces delivery creations into shared add_colis requests. Parcels submitted within
+    `window` seconds of the first pending one go out together, and a batch is sent as soon
+    as it reaches `max_batch` parcels.
+    """
+
+    def __init__(self, service: ZRExpressService, window: float, max_batch: int):
+        self.service = service
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: List[Tuple[Order, User, asyncio.Future]] = []
+        self._timer: Optional[asyncio.Task] = None
+        self._in_flight: set = set()
+
+    async def create_delivery(self, order: Order, user: User) -> Optional[str]:
+        """Tracking ID of the order's parcel once its batch is sent, None if that failed"""
+        tracking_ids = await self.create_deliveries([(order, user)])
+        return tracking_ids.get(str(order.id))
+
+    async def create_deliveries(self, orders: List[Tuple[Order, User]]) -> Dict[str, str]:
+        """Tracking IDs keyed by order ID, for the parcels whose batch was accepted"""
+        loop = asyncio.get_running_loop()
+        futures = []
+        for order, user in orders:
+            future = loop.create_future()
+            futures.append(future)
+            self._pending.append((order, user, future))
+            if len(self._pending) >= self.max_batch:
+                self._send(self._take())
+        if self._pending and self._timer is None:
+            self._timer = asyncio.create_task(self._send_after_window())
+        tracking_ids = await asyncio.gather(*futures)
+        return {
+            str(order.id): tracking_id
+            for (order, _), tracking_id in zip(orders, tracking_ids)
+            if tracking_id
+        }
+
+    def _take(self) -> List[Tuple[Order, User, asyncio.Future]]:
+        batch, self._pending = self._pending, []
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return batch
+
+    def _send(self, batch: List[Tuple[Order, User, asyncio.Future]]) -> None:
+        task = asyncio.create_task(self._submit(batch))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def _send_after_window(self) -> None:
+        await asyncio.sleep(self.window)
+        self._timer = None
+        batch, self._pending = self._pending, []
+        # Sent as its own in-flight task, so flush() waits for it and _take() cannot cancel it.
+        self._send(batch)
+
+    async def _submit(self, batch: List[Tuple[Order, User, asyncio.Future]]) -> None:
+        tracking_ids = {}
+        try:
+            tracking_ids = await self.service.create_deliveries([(order, user) for order, user, _ in batch])
+        finally:
+            for order, _, future in batch:
+                if not future.done():
+                    future.set_result(tracking_ids.get(str(order.id)))
+
+    async def flush(self) -> None:
+        """Sends whatever is pending right away and waits for batches in flight; called on shutdown."""
+        if self._pending:
+            self._send(self._take())
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+
+
+zr_express_service = ZRExpressService()
+zr_delivery_batcher = DeliveryBatcher(
+    zr_express_service,
+    window=settings.ZR_EXPRESS_BATCH_WINDOW_SECONDS,
+    max_batch=settings.ZR_EXPRESS_BATCH_MAX_SIZE,
+)
\ No newline at end of file
@@ -0,0 +1,62 @@
+import asyncio
+from typing import Awaitable, Callable, List
+from app.config import settings
+from app.services.Order import orderService
+from app.services.delivery_outbox import deliveryOutboxService
+
+
+async def run_periodically(name: str, interval: float, job: Callable[[], Awaitable[object]]) -> None:
+    """Runs `job` every `interval` seconds until cancelled; a failed run is logged and retried next time."""
+    while True:
+        try:
+            await job()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Background task {name} failed: {str(e)}")
+        await asyncio.sleep(interval)
+
+
+async def poll_delivery_statuses() -> None:
+    delivered = await orderService.refresh_delivery_tracking(batch_size=settings.DELIVERY_POLL_BATCH_SIZE)
+    if delivered:
+        print(f"Marked {delivered} orders as delivered from ZR Express tracking")
+
+
+async def enqueue_missing_deliveries() -> None:
+    enqueued = await orderService.enqueue_missing_deliveries()
+    if enqueued:
+        print(f"Enqueued {enqueued} ready delivery orders that had no delivery job")
+
+
+async def run_delivery_worker() -> None:
+    """Drains the delivery outbox, waking up on new jobs or every DELIVERY_OUTBOX_POLL_SECONDS."""
+    while True:
+        try:
+            processed = await orderService.process_delivery_jobs(settings.ZR_EXPRESS_BATCH_MAX_SIZE)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Background task delivery-worker failed: {str(e)}")
+            processed = 0
+        if not processed:
+            await deliveryOutboxService.wait_for_jobs(settings.DELIVERY_OUTBOX_POLL_SECONDS)
+
+
+def start_background_tasks() -> List[asyncio.Task]:
+    tasks = [asyncio.create_task(run_delivery_worker())]
+    if settings.DELIVERY_OUTBOX_SWEEP_SECONDS > 0:
+        tasks.append(asyncio.create_task(
+            run_periodically("delivery-outbox-sweep", settings.DELIVERY_OUTBOX_SWEEP_SECONDS, enqueue_missing_deliveries)
+        ))
+    if settings.DELIVERY_POLL_INTERVAL_SECONDS > 0:
+        tasks.append(asyncio.create_task(
+            run_periodically("delivery-status-poller", settings.DELIVERY_POLL_INTERVAL_SECONDS, poll_delivery_statuses)
+        ))
+    return tasks
+
+
+async def stop_background_tasks(tasks: List[asyncio.Task]) -> None:
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
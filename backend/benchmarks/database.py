@@ -0,0 +1,22 @@
+"""
+Guard for the benchmarks that write to MongoDB. They insert, delete and rebuild data,
+so they only run against a local server and a database whose name marks it as a
+benchmark one, e.g.
+
+    MONGO_URI=mongodb://127.0.0.1:27017 MONGO_DB=editions_bench python -m benchmarks.delivery_load
+"""
+from pymongo.uri_parser import parse_uri
+from app.config import settings
+
+
+LOCAL_HOSTS = {"localhost", "127.0.0.1", "::1"}
+
+
+def require_benchmark_database() -> None:
+    if "+srv" in settings.MONGO_URI.split("://", 1)[0]:
+        raise SystemExit("MONGO_URI is an SRV (cluster) URI; benchmarks only run against a local MongoDB")
+    hosts = {host for host, _ in parse_uri(settings.MONGO_URI)["nodelist"]}
+    if not hosts <= LOCAL_HOSTS:
+        raise SystemExit(f"MONGO_URI points at {', '.join(sorted(hosts))}; benchmarks only run against a local MongoDB")
+    if "bench" not in settings.MONGO_DB.lower():
+        raise SystemExit(f"MONGO_DB is {settings.MONGO_DB!r}; benchmarks need a dedicated database with 'bench' in its name")
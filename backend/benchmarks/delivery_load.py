@@ -0,0 +1,166 @@
+"""
+Drives ready/delivery transitions through orderService against the ZR Express simulator
+and reports throughput and latency percentiles.
+
+    ZR_SIM_DELIVER_AFTER_SECONDS=5 uvicorn benchmarks.zr_express_simulator:app --port 8090
+    MONGO_URI=mongodb://127.0.0.1:27017 MONGO_DB=editions_bench \
+    ZR_EXPRESS_BASE_URL=http://127.0.0.1:8090/api_v1 python -m benchmarks.delivery_load --orders 2000
+
+Refuses to run unless MongoDB is local and the database is a benchmark one (see
+benchmarks.database). Everything it creates is tagged with a benchmark era and deleted
+at the end, after which the analytics rollups are rebuilt.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Awaitable, Callable, List
+import httpx
+from beanie.operators import In
+from app.config import settings
+from app.main import init_mongo
+from app.models.delivery_job import DeliveryJob, DeliveryJobStatus
+from app.models.material import Material
+from app.models.order import DeliveryType, Order, OrderCreate, OrderStatus
+from app.models.user import Role, User
+from app.services.analytics import rollupService
+from app.services.Order import orderService
+from app.services.zr_service import zr_delivery_batcher, zr_express_service
+from app.tasks import run_delivery_worker
+from benchmarks.database import require_benchmark_database
+
+
+def report(name: str, latencies: List[float], elapsed: float) -> None:
+    if len(latencies) < 2:
+        print(f"  {name:<26} {len(latencies)} samples")
+        return
+    p = statistics.quantiles(latencies, n=100, method="inclusive")
+    print(
+        f"  {name:<26} {len(latencies):6d} in {elapsed:7.2f} s  {len(latencies) / elapsed:8.1f}/s"
+        f"   p50 {p[49] * 1000:8.1f} ms  p95 {p[94] * 1000:8.1f} ms  p99 {p[98] * 1000:8.1f} ms"
+    )
+
+
+async def run_all(items: list, concurrency: int, call: Callable[[object], Awaitable[object]]) -> tuple:
+    """Runs `call` over `items` with at most `concurrency` in flight; returns (latencies, elapsed)."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def timed(item):
+        async with semaphore:
+            started = time.perf_counter()
+            await call(item)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(timed(item) for item in items))
+    return latencies, time.perf_counter() - started
+
+
+async def wait_for_status(order_ids: list, status: OrderStatus, timeout: float, step: Callable[[], Awaitable[object]] = None) -> float:
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        if step:
+            await step()
+        remaining = await Order.find(In(Order.id, order_ids), {"status": {"$ne": status.value}}).count()
+        if not remaining:
+            break
+        await asyncio.sleep(0.2)
+    return time.perf_counter() - started
+
+
+async def main(args: argparse.Namespace) -> None:
+    if "procolis.com" in settings.ZR_EXPRESS_BASE_URL:
+        raise SystemExit("ZR_EXPRESS_BASE_URL points at the real procolis API; point it at the simulator")
+    require_benchmark_database()
+    await init_mongo()
+    zr_express_service.start()
+    era = f"bench-{int(time.time())}"
+
+    admin = await User(email=f"admin-{era}@bench.local", hashed_password="-", full_name="Bench admin",
+                       phone_number="0555000000", roles=[Role.ADMIN], era=era).insert()
+    students = [
+        User(email=f"student-{i}-{era}@bench.local", hashed_password="-", full_name=f"Student {i}",
+             phone_number="0555000000", era=era)
+        for i in range(args.students)
+    ]
+    inserted = await User.insert_many(students)
+    students = await User.find(In(User.id, inserted.inserted_ids)).to_list()
+    materials = [
+        Material(title=f"Bench material {i}", study_year="1", specialite=None, description=None,
+                 material_type="polycopie", price_dzd=200 + i, pdf_url=None)
+        for i in range(5)
+    ]
+    inserted = await Material.insert_many(materials)
+    materials = await Material.find(In(Material.id, inserted.inserted_ids)).to_list()
+
+    worker = asyncio.create_task(run_delivery_worker())
+    try:
+        print(f"{args.orders} delivery orders, concurrency {args.concurrency}, simulator {settings.ZR_EXPRESS_BASE_URL}")
+
+        def cart(i: int) -> List[OrderCreate]:
+            return [OrderCreate(
+                materiel_id=str(materials[(i + j) % len(materials)].id),
+                quantity=j + 1,
+                delivery_type=DeliveryType.DELIVERY,
+                delivery_address="Bench address",
+                delivery_phone="0555000000",
+            ) for j in range(2)]
+
+        orders = []
+
+        async def create(i):
+            orders.append(await orderService.create_order(students[i % len(students)], cart(i)))
+
+        report("create_order", *await run_all(range(args.orders), args.concurrency, create))
+        order_ids = [order.id for order in orders]
+        report("accept_order_for_printing", *await run_all(
+            orders, args.concurrency, lambda order: orderService.accept_order_for_printing(str(order.id), admin)
+        ))
+        ready_started = time.perf_counter()
+        report("mark_order_as_ready", *await run_all(
+            orders, args.concurrency,
+            lambda order: orderService.mark_order_as_ready(str(order.id), order.created_at, admin),
+        ))
+
+        await wait_for_status(order_ids, OrderStatus.OUT_FOR_DELIVERY, args.timeout)
+        jobs = await DeliveryJob.find(In(DeliveryJob.order_id, order_ids), DeliveryJob.status == DeliveryJobStatus.DONE).to_list()
+        report("ready -> out for delivery", [
+            (job.completed_at - job.created_at).total_seconds() for job in jobs if job.completed_at
+        ], time.perf_counter() - ready_started)
+        if len(jobs) < len(order_ids):
+            print(f"  {len(order_ids) - len(jobs)} deliveries not created within {args.timeout:.0f} s")
+
+        if args.poll:
+            elapsed = await wait_for_status(
+                order_ids, OrderStatus.DELIVERED, args.timeout,
+                step=lambda: orderService.refresh_delivery_tracking(batch_size=settings.DELIVERY_POLL_BATCH_SIZE),
+            )
+            delivered = await Order.find(In(Order.id, order_ids), Order.status == OrderStatus.DELIVERED).count()
+            print(f"  poller delivered {delivered} orders in {elapsed:.2f} s")
+
+        async with httpx.AsyncClient() as client:
+            stats_url = settings.ZR_EXPRESS_BASE_URL.rsplit("/api_v1", 1)[0] + "/stats"
+            print(f"  simulator: {(await client.get(stats_url)).json()}")
+    finally:
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
+        await zr_delivery_batcher.flush()
+        await zr_express_service.close()
+        bench_orders = Order.find(Order.student_era == era)
+        bench_ids = [order.id for order in await bench_orders.to_list()]
+        await DeliveryJob.find(In(DeliveryJob.order_id, bench_ids)).delete()
+        await bench_orders.delete()
+        await Material.find(In(Material.id, [material.id for material in materials])).delete()
+        await User.find(User.era == era).delete()
+        await rollupService.rebuild()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--students", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--timeout", type=float, default=300, help="seconds to wait for each asynchronous phase")
+    parser.add_argument("--poll", action="store_true", help="also wait for the poller to mark parcels delivered")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,89 @@
+"""
+Compares reading student-facing materials as full Material documents rebuilt into
+materialUser with projecting straight into materialUser.
+
+    MONGO_URI=mongodb://127.0.0.1:27017 MONGO_DB=editions_bench \
+    python -m benchmarks.material_projection [--materials 5000] [--runs 5]
+
+Refuses to run unless MongoDB is local and the database is a benchmark one (see
+benchmarks.database). The materials it inserts are deleted at the end.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, List
+import bson
+from beanie.odm.utils.projection import get_projection
+from beanie.operators import In
+from bson import ObjectId
+from app.main import init_mongo
+from app.models.material import Material, materialUser
+from benchmarks.database import require_benchmark_database
+
+
+def make_documents(count: int) -> List[dict]:
+    return [
+        {
+            "_id": ObjectId(),
+            "title": f"Polycopie {i}",
+            "study_year": str(i % 7 + 1),
+            "specialite": ["Medecine", "Pharmacie", "Dentaire"][i % 3],
+            "module": f"Module {i % 40}",
+            "description": "Cours, résumés et exercices corrigés du module, édition revue et augmentée. " * 3,
+            "image_urls": [f"https://minio.example.com/materials/images/{ObjectId()}.png" for _ in range(3)],
+            "material_type": "polycopie" if i % 2 else "book",
+            "price_dzd": 150.0 + i % 500,
+            "pdf_url": f"https://minio.example.com/materials/documents/{ObjectId()}_cours_complet_{i}.pdf",
+            "created_at": datetime(2024, 1, 1) + timedelta(minutes=i),
+        }
+        for i in range(count)
+    ]
+
+
+async def median_time(read: Callable[[], Awaitable[list]], runs: int) -> tuple:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = await read()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), result
+
+
+async def main(args: argparse.Namespace) -> None:
+    require_benchmark_database()
+    await init_mongo()
+    documents = make_documents(args.materials)
+    collection = Material.get_pymongo_collection()
+    await collection.insert_many(documents)
+    ids = [doc["_id"] for doc in documents]
+    try:
+        async def full():
+            materials = await Material.find(In(Material.id, ids)).sort("_id").to_list()
+            return [materialUser(**m.model_dump()) for m in materials]
+
+        async def projected():
+            return await Material.find(In(Material.id, ids), projection_model=materialUser).sort("_id").to_list()
+
+        full_bytes = sum(len(bson.encode(doc)) async for doc in collection.find({"_id": {"$in": ids}}))
+        projected_bytes = sum(
+            len(bson.encode(doc)) async for doc in collection.find({"_id": {"$in": ids}}, get_projection(materialUser))
+        )
+        full_time, full_result = await median_time(full, args.runs)
+        projected_time, projected_result = await median_time(projected, args.runs)
+
+        print(f"{args.materials} materials, median of {args.runs} runs")
+        print(f"  full       {full_time * 1000:8.1f} ms   {full_bytes / 1024:8.0f} KiB")
+        print(f"  projected  {projected_time * 1000:8.1f} ms   {projected_bytes / 1024:8.0f} KiB   x{full_time / projected_time:4.1f}")
+        same = [m.model_dump() for m in full_result] == [m.model_dump() for m in projected_result]
+        print(f"  results: {'identical' if same else 'DIFFERENT'}")
+    finally:
+        await collection.delete_many({"_id": {"$in": ids}})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--materials", type=int, default=5000)
+    parser.add_argument("--runs", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,135 @@
+"""
+Compares the default response_model path with FastJSONResponse on order listings.
+
+    python -m benchmarks.order_serialization [--orders 10000] [--runs 5]
+
+Both paths serve the same in-memory orders, so only validation and encoding are measured.
+Bodies are compared exactly, falling back to comparing their shape.
+"""
+import argparse
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import List
+from beanie import Link
+from bson import DBRef, ObjectId
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.models.material import Material
+from app.models.order import DeliveryType, Order, OrderLine, OrderStatus, orderResponse, serialize_order, serialize_order_F, serialize_order_response
+from app.models.user import User
+from app.responses import FastJSONResponse
+
+
+def make_orders(count: int) -> List[Order]:
+    materials = [
+        Material.model_construct(
+            id=ObjectId(),
+            title=f"Polycopie {i}",
+            study_year="3",
+            specialite="Informatique",
+            module=f"Module {i}",
+            description="Cours et exercices corrigés",
+            image_urls=[f"materials/images/{i}.png"],
+            material_type="polycopie" if i % 2 else "book",
+            price_dzd=150.0 + i,
+            pdf_url=None,
+            created_at=datetime(2024, 1, 1),
+        )
+        for i in range(20)
+    ]
+    orders = []
+    for i in range(count):
+        items = [(materials[(i + j) % len(materials)], j + 1) for j in range(3)]
+        lines = [OrderLine.snapshot(material, quantity) for material, quantity in items]
+        orders.append(Order.model_construct(
+            id=ObjectId(),
+            student=Link(DBRef("User", ObjectId()), User),
+            student_era="L3",
+            item=[],
+            lines=lines,
+            total_dzd=sum(line.line_total_dzd for line in lines),
+            status=list(OrderStatus)[i % len(OrderStatus)],
+            appointment_date=None,
+            created_at=datetime(2024, 1, 1) + timedelta(minutes=i),
+            assigned_admin=None,
+            delivery_type=DeliveryType.PICKUP,
+            delivery_address=None,
+            delivery_phone=None,
+            zr_tracking_id=None,
+        ))
+    return orders
+
+
+def make_app(orders: List[Order]) -> FastAPI:
+    app = FastAPI()
+    serialized = [serialize_order(order) for order in orders]
+    serialized_response = [serialize_order_response(order) for order in orders]
+    serialized_f = [serialize_order_F(order) for order in orders]
+
+    @app.get("/default/orders", response_model=List[Order])
+    async def default_orders():
+        return orders
+
+    @app.get("/fast/orders")
+    async def fast_orders():
+        return FastJSONResponse(orders)
+
+    @app.get("/default/my", response_model=List[orderResponse])
+    async def default_my():
+        return serialized
+
+    @app.get("/fast/my")
+    async def fast_my():
+        return FastJSONResponse(serialized_response)
+
+    @app.get("/default/admin")
+    async def default_admin():
+        return serialized_f
+
+    @app.get("/fast/admin")
+    async def fast_admin():
+        return FastJSONResponse(serialized_f)
+
+    return app
+
+
+def shape(value):
+    if isinstance(value, dict):
+        return {key: shape(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [shape(item) for item in value]
+    return None
+
+
+def timed(client: TestClient, path: str, runs: int) -> tuple:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        response = client.get(path)
+        timings.append(time.perf_counter() - started)
+        response.raise_for_status()
+    return statistics.median(timings), response.json()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--orders", type=int, default=10_000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    client = TestClient(make_app(make_orders(args.orders)))
+    print(f"{args.orders} orders, median of {args.runs} runs")
+    for endpoint in ("orders", "my", "admin"):
+        default_time, default_body = timed(client, f"/default/{endpoint}", args.runs)
+        fast_time, fast_body = timed(client, f"/fast/{endpoint}", args.runs)
+        identical = default_body == fast_body
+        same_shape = shape(default_body) == shape(fast_body)
+        print(
+            f"  {endpoint:<7} default {default_time * 1000:8.1f} ms   fast {fast_time * 1000:8.1f} ms"
+            f"   x{default_time / fast_time:5.1f}   body: {'identical' if identical else 'same shape' if same_shape else 'DIFFERENT'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
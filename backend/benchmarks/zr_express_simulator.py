@@ -0,0 +1,122 @@
+"""
+Local stand-in for the procolis (ZR Express) API, for load tests only.
+
+    uvicorn benchmarks.zr_express_simulator:app --port 8090
+
+Point the backend at it with ZR_EXPRESS_BASE_URL=http://127.0.0.1:8090/api_v1.
+Behaviour is configured through environment variables:
+
+    ZR_SIM_LATENCY_MS          base latency of every call (default 150)
+    ZR_SIM_JITTER_MS           extra uniform random latency (default 100)
+    ZR_SIM_ERROR_RATE          share of calls answered with a 500, 0..1 (default 0)
+    ZR_SIM_RATE_LIMIT          requests per second before answering 429, 0 = unlimited (default 0)
+    ZR_SIM_DELIVER_AFTER_SECONDS  age at which /lire reports a parcel as delivered (default 60)
+"""
+import asyncio
+import os
+import random
+import time
+from typing import Any, Dict, List
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+
+LATENCY_MS = float(os.getenv("ZR_SIM_LATENCY_MS", "150"))
+JITTER_MS = float(os.getenv("ZR_SIM_JITTER_MS", "100"))
+ERROR_RATE = float(os.getenv("ZR_SIM_ERROR_RATE", "0"))
+RATE_LIMIT = float(os.getenv("ZR_SIM_RATE_LIMIT", "0"))
+DELIVER_AFTER_SECONDS = float(os.getenv("ZR_SIM_DELIVER_AFTER_SECONDS", "60"))
+
+
+class Colis(BaseModel):
+    Colis: List[Dict[str, Any]]
+
+
+class TokenBucket:
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = rate
+        self.updated_at = time.monotonic()
+
+    def take(self) -> bool:
+        if self.rate <= 0:
+            return True
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+app = FastAPI(title="ZR Express simulator")
+bucket = TokenBucket(RATE_LIMIT)
+parcels: Dict[str, Dict[str, Any]] = {}
+stats = {"requests": 0, "rate_limited": 0, "errors": 0, "parcels": 0}
+
+
+@app.middleware("http")
+async def simulate_conditions(request: Request, call_next):
+    stats["requests"] += 1
+    if request.url.path.endswith("/stats"):
+        return await call_next(request)
+    if not bucket.take():
+        stats["rate_limited"] += 1
+        return JSONResponse({"detail": "Too many requests"}, status_code=429)
+    await asyncio.sleep((LATENCY_MS + random.uniform(0, JITTER_MS)) / 1000)
+    if random.random() < ERROR_RATE:
+        stats["errors"] += 1
+        return JSONResponse({"detail": "Simulated failure"}, status_code=500)
+    return await call_next(request)
+
+
+def _check_credentials(token: str, key: str) -> None:
+    if not token or not key:
+        raise HTTPException(status_code=401, detail="Missing token or key")
+
+
+def _situation(parcel: Dict[str, Any]) -> str:
+    if time.time() - parcel["created_at"] >= DELIVER_AFTER_SECONDS:
+        return "Livré"
+    return "Prêt à expédier" if parcel.get("ready") else "En préparation"
+
+
+@app.post("/api_v1/add_colis")
+async def add_colis(body: Colis, token: str = Header(""), key: str = Header("")):
+    _check_credentials(token, key)
+    for colis in body.Colis:
+        parcels[colis["Tracking"]] = {**colis, "created_at": time.time(), "ready": False}
+    stats["parcels"] += len(body.Colis)
+    return {"Colis": [{"Tracking": colis["Tracking"], "MessageRetour": "Good"} for colis in body.Colis]}
+
+
+@app.post("/api_v1/lire")
+async def lire(body: Colis, token: str = Header(""), key: str = Header("")):
+    _check_credentials(token, key)
+    found = []
+    for colis in body.Colis:
+        parcel = parcels.get(colis.get("Tracking"))
+        if parcel:
+            found.append({
+                "Tracking": parcel["Tracking"],
+                "Client": parcel.get("Client"),
+                "Total": parcel.get("Total"),
+                "Situation": _situation(parcel),
+            })
+    return {"Colis": found}
+
+
+@app.post("/api_v1/pret")
+async def pret(body: Colis, token: str = Header(""), key: str = Header("")):
+    _check_credentials(token, key)
+    for colis in body.Colis:
+        if colis.get("Tracking") in parcels:
+            parcels[colis["Tracking"]]["ready"] = True
+    return {"Colis": [{"Tracking": colis.get("Tracking"), "MessageRetour": "Good"} for colis in body.Colis]}
+
+
+@app.get("/stats")
+async def get_stats():
+    return stats